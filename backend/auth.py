@@ -1,17 +1,30 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from .database import SessionLocal
+from .database import SessionLocal, get_async_db
 from .models import User
 
 SECRET_KEY = "service-center-secret-key-2024-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
+# Кэш проверенных токенов: сколько записей держать и сколько секунд доверять записи.
+# TOKEN_CACHE_TTL действует, пока сбросы из других процессов доходят через LISTEN
+# (events.RequestEventHub), TOKEN_CACHE_FALLBACK_TTL - пока LISTEN-соединения нет
+TOKEN_CACHE_SIZE = 1024
+TOKEN_CACHE_TTL = 60
+TOKEN_CACHE_FALLBACK_TTL = 5
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -35,7 +48,77 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+@dataclass(frozen=True)
+class Principal:
+    """Текущий пользователь в объёме, нужном для проверки прав"""
+    user_id: int
+    user_type: str
+    login: str
+
+class TokenCache:
+    """Ограниченный LRU-кэш токен -> Principal со сроком жизни записей.
+
+    Изменение или удаление пользователя сбрасывает его записи в своём процессе
+    сразу, а в остальных - по уведомлению из events (USER_CHANNEL). Пока
+    уведомления не доходят (LISTEN-соединение не открыто или потеряно), записи
+    живут fallback_ttl секунд: это и есть наибольшая задержка, с которой другой
+    процесс замечает смену роли или удаление.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL,
+                 fallback_ttl: float = TOKEN_CACHE_FALLBACK_TTL):
+        self.maxsize = maxsize
+        self.synced_ttl = ttl
+        self.fallback_ttl = fallback_ttl
+        self.ttl = fallback_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return principal
+
+    def put(self, token: str, principal: Principal, token_exp: float):
+        # Запись не должна пережить сам токен
+        expires_at = min(time.time() + self.ttl, token_exp)
+        with self._lock:
+            self._entries[token] = (principal, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            stale = [t for t, (p, _) in self._entries.items() if p.user_id == user_id]
+            for token in stale:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def set_synced(self, synced: bool):
+        """Включить или выключить доверие к рассылке сбросов; сбросы за время без неё потеряны"""
+        with self._lock:
+            self._entries.clear()
+            self.ttl = self.synced_ttl if synced else self.fallback_ttl
+
+token_cache = TokenCache()
+
+def invalidate_user(user_id: int):
+    """Сбросить закэшированные токены пользователя после изменения или удаления"""
+    token_cache.invalidate_user(user_id)
+
+def _decode_token(token: str):
+    """Проверить подпись и срок токена; возвращает (user_id, exp)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Неавторизовано: неверный токен",
@@ -48,14 +131,56 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(User).filter(User.user_id == int(user_id)).first()
-    if user is None:
-        raise credentials_exception
-    return user
+    return int(user_id), payload.get("exp", 0)
+
+def _principal_query(user_id: int):
+    return select(User.user_id, User.user_type, User.login).where(User.user_id == user_id)
+
+def _remember(token: str, row, exp: float) -> Principal:
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Неавторизовано: неверный токен",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    principal = Principal(user_id=row.user_id, user_type=row.user_type, login=row.login)
+    token_cache.put(token, principal, exp)
+    return principal
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    principal = token_cache.get(token)
+    if principal is not None:
+        return principal
+
+    user_id, exp = _decode_token(token)
+    row = db.execute(_principal_query(user_id)).first()
+    return _remember(token, row, exp)
+
+def principal_for_token(token: str) -> Optional[Principal]:
+    """Principal по токену вне зависимостей FastAPI (например, в middleware); None для неверного токена"""
+    principal = token_cache.get(token)
+    if principal is not None:
+        return principal
+    try:
+        user_id, exp = _decode_token(token)
+    except HTTPException:
+        return None
+    with SessionLocal() as db:
+        row = db.execute(_principal_query(user_id)).first()
+    return _remember(token, row, exp) if row is not None else None
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme),
+                                 db: AsyncSession = Depends(get_async_db)) -> Principal:
+    principal = token_cache.get(token)
+    if principal is not None:
+        return principal
+
+    user_id, exp = _decode_token(token)
+    row = (await db.execute(_principal_query(user_id))).first()
+    return _remember(token, row, exp)
 
 def require_roles(*allowed_roles: str):
-    def checker(current_user: User = Depends(get_current_user)):
+    def checker(current_user: Principal = Depends(get_current_user)):
         if current_user.user_type not in allowed_roles:
             raise HTTPException(
                 status_code=403, 
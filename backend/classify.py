@@ -0,0 +1,119 @@
+"""Категория неисправности по описанию заявки.
+
+Категория вычисляется при записи (создание заявки, изменение описания) и
+хранится в requests.problem_category, поэтому статистика по типам проблем -
+это GROUP BY по индексированной колонке, без разбора текста при чтении.
+
+Правила - основы слов в PROBLEM_RULES: описание приводится к нижнему регистру,
+ё заменяется на е, и побеждает первое правило, чья основа встречается с начала
+слова. Порядок важен: «Гудит, но не замораживает» - это охлаждение, а не шум,
+«Перестали работать многие режимы» - режимы, а не полный отказ.
+
+Строки, записанные до появления колонки или загруженные через COPY
+(importer, generate), заполняются пакетами; после изменения правил
+--all пересчитывает все строки:
+    python -m backend.classify backfill
+    python -m backend.classify backfill --all --batch-size 20000
+"""
+import argparse
+import re
+import sys
+import time
+from sqlalchemy import select, update, func, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+from . import models
+from .database import SessionLocal
+
+OTHER_CATEGORY = "Прочее"
+UNCLASSIFIED = "Не классифицировано"
+BACKFILL_BATCH_SIZE = 10_000
+
+# (категория, основы); основа сопоставляется с началом слова
+PROBLEM_RULES = (
+    ("Не охлаждает", ("не мороз", "не заморажива", "не охлажда", "плохо мороз", "плохо охлажда", "тает")),
+    ("Не греет", ("не гре", "не нагрева", "плохо гре")),
+    ("Неисправны режимы", ("режим", "программ", "кнопк", "дисплей", "панел", "таймер")),
+    ("Протечка", ("теч", "протека", "подтека", "лужа")),
+    ("Искрит, запах гари", ("искр", "запах гари", "гарь", "дым", "сгорел", "замыка", "выбива", "бьет ток")),
+    ("Шум, вибрация", ("шум", "гуд", "стуч", "вибр", "трещ", "скрип")),
+    ("Механическое повреждение", ("слом", "разбит", "треснул", "трещин", "поврежд", "отвалил")),
+    ("Не включается", ("не включа", "перестал включа", "перестала включа", "не запуска", "не заряжа")),
+    ("Не работает", ("перестал работ", "перестала работ", "перестало работ", "перестали работ",
+                     "не работа", "сломал")),
+)
+
+_RULES = [
+    (category, re.compile(r"\b(?:" + "|".join(re.escape(stem).replace(r"\ ", r"\s+") for stem in stems) + ")"))
+    for category, stems in PROBLEM_RULES
+]
+
+def classify_problem(description: str) -> str:
+    text = (description or "").lower().replace("ё", "е")
+    for category, pattern in _RULES:
+        if pattern.search(text):
+            return category
+    return OTHER_CATEGORY
+
+def with_problem_category(values: dict) -> dict:
+    """Добавить категорию в значения для INSERT/UPDATE, если в них есть описание"""
+    if "problem_description" in values:
+        values["problem_category"] = classify_problem(values["problem_description"])
+    return values
+
+def backfill(db: Session, reclassify: bool = False, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Заполнить категорию пакетами по request_id; каждый пакет - своя транзакция.
+
+    Пакет читается по первичному ключу, а обновляется одним UPDATE на
+    категорию (их немного), поэтому блокировки держатся недолго и
+    параллельная работа API не останавливается.
+    """
+    R = models.Request
+    last_id, total = 0, 0
+    started = time.perf_counter()
+    while True:
+        query = select(R.request_id, R.problem_description).where(R.request_id > last_id)
+        if not reclassify:
+            query = query.where(R.problem_category.is_(None))
+        rows = db.execute(query.order_by(R.request_id).limit(batch_size)).all()
+        if not rows:
+            return total
+
+        by_category = {}
+        for request_id, description in rows:
+            by_category.setdefault(classify_problem(description), []).append(request_id)
+        for category, ids in by_category.items():
+            db.execute(
+                update(R).where(R.request_id == any_(bindparam("ids", ids, type_=ARRAY(Integer))))
+                .values(problem_category=category),
+                execution_options={"synchronize_session": False},
+            )
+        db.commit()
+
+        last_id = rows[-1].request_id
+        total += len(rows)
+        elapsed = time.perf_counter() - started
+        print(f"  классифицировано {total:,} заявок, {total / elapsed:,.0f} строк/с", flush=True)
+
+def category_counts(db: Session) -> dict:
+    R = models.Request
+    return dict(db.execute(select(R.problem_category, func.count()).group_by(R.problem_category)).all())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--all", action="store_true", help="пересчитать и уже заполненные строки")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        print(f"Классифицировано заявок: {backfill(db, reclassify=args.all, batch_size=args.batch_size):,}")
+        for category, count in sorted(category_counts(db).items(), key=lambda item: -item[1]):
+            print(f"  {category or UNCLASSIFIED}: {count:,}")
+        return 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""ETag и условные GET: If-None-Match с актуальным ETag даёт 304 без тела.
+
+ETag строки строится из таблицы, первичного ключа и колонки version, которую
+SQLAlchemy увеличивает при каждом UPDATE (version_id_col в models). ETag
+страницы списка - хеш ETag её строк и курсора следующей страницы, поэтому
+он меняется при изменении, добавлении или удалении любой строки на странице.
+"""
+import hashlib
+from typing import Optional
+from fastapi import Response
+from sqlalchemy import inspect
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def row_etag(obj, model=None) -> str:
+    """ETag ORM-объекта или строки Row из выборки колонок модели model"""
+    if model is None:
+        mapper = inspect(obj).mapper
+        pk = mapper.primary_key_from_instance(obj)
+    else:
+        mapper = inspect(model)
+        pk = [getattr(obj, c.key) for c in mapper.primary_key]
+    key = "-".join(str(v) for v in pk)
+    return f'"{mapper.local_table.name}-{key}-v{obj.version}"'
+
+def list_etag(rows, *extra, model=None) -> str:
+    digest = hashlib.sha256()
+    for obj in rows:
+        digest.update(row_etag(obj, model).encode())
+    for value in extra:
+        digest.update(repr(value).encode())
+    return '"%s"' % digest.hexdigest()[:32]
+
+def not_modified(response: Response, if_none_match: Optional[str], etag: str) -> Optional[Response]:
+    """Выставить ETag; вернуть готовый ответ 304, если у клиента та же версия"""
+    response.headers["ETag"] = etag
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=dict(response.headers))
+    return None
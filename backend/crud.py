@@ -1,21 +1,159 @@
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from . import models, schemas
+from sqlalchemy import text, select, insert, update, delete, func, any_, bindparam, literal_column, Integer, exists, case, union
+from sqlalchemy import cast, or_, true, Date, DateTime
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from . import models, schemas, rollup, events, classify
 from .auth import hash_password
+from .pagination import paginate, count_rows
 
 def get_user_by_login(db: Session, login: str):
     return db.query(models.User).filter(models.User.login == login).first()
 
-def get_requests(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Request).offset(skip).limit(limit).all()
+def _list_query(db: Session, model, columns):
+    """Запрос списка: целые объекты или только колонки columns (строки Row)"""
+    return db.query(*columns) if columns else db.query(model)
+
+def get_requests(db: Session, skip: int = 0, limit: int = 100, cursor: str = None, columns: tuple = None):
+    return paginate(_list_query(db, models.Request, columns), [models.Request.request_id],
+                    cursor=cursor, limit=limit, skip=skip)
+
+# Разметка совпадений в headline; фронтенд экранирует текст и возвращает только эти теги
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5"
+# Вклад в ранг: сходство модели по pg_trgm и совпадение в комментариях
+TRGM_WEIGHT = 0.5
+COMMENT_MATCH_WEIGHT = 0.1
+
+# Порядок приоритетов для сортировки; неизвестные значения идут последними
+PRIORITY_ORDER = ("Срочный", "Высокий", "Нормальный", "Низкий")
+
+# Ключи сортировки поиска; NULL заменяется значением, которое ставит строку в конец
+SEARCH_SORTS = {
+    "start_date": models.Request.start_date,
+    "deadline_date": func.coalesce(models.Request.deadline_date, date.max),
+    "priority": case({p: i for i, p in enumerate(PRIORITY_ORDER)},
+                     value=models.Request.priority, else_=len(PRIORITY_ORDER)),
+    "created_at": func.coalesce(models.Request.created_at, datetime.max.replace(tzinfo=timezone.utc)),
+}
+
+def search_requests(db: Session, number: int = None, status: str = None, tech_type: str = None,
+                    client_id: int = None, master_id: int = None, text_query: str = None,
+                    sort: str = None, cursor: str = None, skip: int = 0, limit: int = 100,
+                    count: str = "none"):
+    """Поиск заявок по фильтрам и, если задан text_query, по тексту.
+
+    Текст ищется в search_vector (модель и описание, конфигурация russian),
+    нечётко по tech_model через pg_trgm и в тексте комментариев; описание
+    возвращается с подсветкой. Без sort результаты текстового поиска идут
+    по релевантности (страницы через skip), остальные - по request_id.
+    sort - ключ из SEARCH_SORTS, с префиксом "-" по убыванию; страницы по курсору.
+    Возвращает (rows, next_cursor, total, exact).
+    """
+    R = models.Request
+    conditions = []
+    if number is not None:
+        conditions.append(R.request_id == number)
+    if status is not None:
+        conditions.append(R.request_status == status)
+    if tech_type is not None:
+        conditions.append(R.tech_type == tech_type)
+    if client_id is not None:
+        conditions.append(R.client_id == client_id)
+    if master_id is not None:
+        conditions.append(R.master_id == master_id)
+
+    entities = [R]
+    if text_query:
+        tsquery = func.websearch_to_tsquery(models.search_config(), text_query)
+        comment_vector = func.to_tsvector(models.search_config(), models.Comment.message)
+        in_comments = exists().where(models.Comment.request_id == R.request_id,
+                                     comment_vector.op("@@")(tsquery))
+        rank = (
+            func.ts_rank_cd(R.search_vector, tsquery)
+            + TRGM_WEIGHT * func.similarity(R.tech_model, text_query)
+            + case((in_comments, COMMENT_MATCH_WEIGHT), else_=0)
+        ).label("rank")
+        headline = func.ts_headline(models.search_config(), R.problem_description, tsquery,
+                                    HEADLINE_OPTIONS).label("headline")
+        # Кандидаты собираются через UNION, чтобы каждая ветка шла по своему GIN-индексу
+        candidates = union(
+            select(R.request_id).where(R.search_vector.op("@@")(tsquery)),
+            select(R.request_id).where(R.tech_model.op("%")(text_query)),
+            select(models.Comment.request_id).where(comment_vector.op("@@")(tsquery)),
+        )
+        conditions.append(R.request_id.in_(candidates))
+        entities += [rank, headline]
+
+    total, exact = count_rows(db.query(R.request_id).filter(*conditions), count)
+
+    q = db.query(*entities).filter(*conditions)
+    if text_query and not sort:
+        rows = q.order_by(literal_column("rank").desc(), R.request_id).offset(skip).limit(limit).all()
+        next_cursor = None
+    elif sort:
+        descending = sort.startswith("-")
+        sort_key = SEARCH_SORTS[sort.lstrip("-")].label("sort_key")
+        q = q.add_columns(sort_key)
+        rows, next_cursor = paginate(q, [sort_key.element, R.request_id], cursor=cursor, limit=limit,
+                                     skip=skip, descending=descending,
+                                     key=lambda row: (row.sort_key, row[0].request_id))
+    else:
+        rows, next_cursor = paginate(q, [R.request_id], cursor=cursor, limit=limit, skip=skip,
+                                     key=(lambda row: (row[0].request_id,)) if text_query else None)
+
+    if text_query:
+        rows = [
+            schemas.RequestSearchHit.model_validate(row[0]).model_copy(
+                update={"rank": row.rank, "headline": row.headline})
+            for row in rows
+        ]
+    elif sort:
+        rows = [row[0] for row in rows]
+    return rows, next_cursor, total, exact
+
+def get_client_requests(db: Session, client_id: int, status: str = None,
+                        skip: int = 0, limit: int = 100, cursor: str = None, columns: tuple = None):
+    query = _list_query(db, models.Request, columns).filter(models.Request.client_id == client_id)
+    if status:
+        query = query.filter(models.Request.request_status == status)
+    return paginate(query, [models.Request.request_id], cursor=cursor, limit=limit, skip=skip)
+
+def get_client_request(db: Session, client_id: int, request_id: int):
+    return db.query(models.Request).filter(
+        models.Request.request_id == request_id,
+        models.Request.client_id == client_id
+    ).first()
+
+def create_client_request(db: Session, client_id: int, request: schemas.ClientRequestCreate):
+    request_data = request.dict()
+    request_data["client_id"] = client_id
+    request_data["request_status"] = "Новая заявка"
+    request_data["priority"] = "Нормальный"
+    
+    if not request_data.get("start_date"):
+        request_data["start_date"] = date.today()
+    
+    try:
+        db_request = models.Request(**classify.with_problem_category(request_data))
+        db.add(db_request)
+        rollup.apply(db, after=[rollup.snapshot(db_request)])
+        db.commit()
+        db.refresh(db_request)
+        return db_request
+    except Exception as e:
+        db.rollback()
+        raise e
 
 def get_request(db: Session, request_id: int):
     return db.query(models.Request).filter(models.Request.request_id == request_id).first()
 
 def create_request(db: Session, request: schemas.RequestCreate):
     try:
-        db_request = models.Request(**request.dict())
+        db_request = models.Request(**classify.with_problem_category(request.dict()))
         db.add(db_request)
+        rollup.apply(db, after=[rollup.snapshot(db_request)])
         db.commit()
         db.refresh(db_request)
         return db_request
@@ -23,26 +161,380 @@ def create_request(db: Session, request: schemas.RequestCreate):
         db.rollback()
         raise e
 
-def update_request(db: Session, request_id: int, request_update: schemas.RequestUpdate):
-    db_request = get_request(db, request_id)
-    if not db_request:
-        return None
-    for key, value in request_update.dict(exclude_unset=True).items():
-        setattr(db_request, key, value)
+# Поля заявки, от которых зависит её вклад в request_stats (см. rollup.snapshot)
+ROLLUP_FIELDS = ("client_id", "tech_type", "request_status", "start_date", "completion_date")
+
+# Строка, возвращённая RETURNING, записывается в identity map поверх загруженной ранее
+RETURNING_OPTIONS = {"synchronize_session": False, "populate_existing": True}
+
+def _commit_detached(db: Session, obj):
+    """Зафиксировать транзакцию, не помечая obj устаревшим.
+
+    Объект уже заполнен из RETURNING; без expunge commit() сбросил бы его
+    атрибуты и сериализация ответа выполнила бы ещё один SELECT.
+    """
+    db.expunge(obj)
     db.commit()
-    db.refresh(db_request)
-    return db_request
+    return obj
+
+def update_request(db: Session, request_id: int, request_update: schemas.RequestUpdate):
+    """Изменить заявку одним UPDATE ... RETURNING.
+
+    Старые значения полей для request_stats берутся из CTE с FOR UPDATE в том же
+    запросе. Если вклад в агрегаты не изменился (мастер, срок), второго запроса нет.
+    Изменения, видимые заказчику, уходят подписчикам через events после COMMIT.
+    """
+    R = models.Request
+    changes = request_update.dict(exclude_unset=True)
+    if not changes:
+        return get_request(db, request_id)
+    classify.with_problem_category(changes)
+
+    old = (select(R.request_id, *(getattr(R, f) for f in ROLLUP_FIELDS))
+           .where(R.request_id == request_id).with_for_update().cte("old"))
+    try:
+        row = db.execute(
+            update(R).where(R.request_id == old.c.request_id)
+            .values(**changes, version=R.version + 1)
+            .returning(R, *(old.c[f] for f in ROLLUP_FIELDS)),
+            execution_options=RETURNING_OPTIONS,
+        ).first()
+        if row is None:
+            db.rollback()
+            return None
+        db_request, *old_values = row
+        before = SimpleNamespace(**dict(zip(ROLLUP_FIELDS, old_values)))
+        rollup.apply(db, before=[rollup.snapshot(before)], after=[rollup.snapshot(db_request)])
+        events.notify_request_changes(db, [db_request], changes)
+        return _commit_detached(db, db_request)
+    except Exception as e:
+        db.rollback()
+        raise e
 
 def delete_request(db: Session, request_id: int):
-    db_request = get_request(db, request_id)
-    if not db_request:
-        return None
-    db.delete(db_request)
-    db.commit()
-    return db_request
+    """Удалить заявку одним DELETE ... RETURNING; вклад в агрегаты берётся из удалённой строки"""
+    R = models.Request
+    try:
+        db_request = db.scalars(
+            delete(R).where(R.request_id == request_id).returning(R),
+            execution_options=RETURNING_OPTIONS,
+        ).first()
+        if db_request is None:
+            db.rollback()
+            return None
+        rollup.apply(db, before=[rollup.snapshot(db_request)])
+        return _commit_detached(db, db_request)
+    except Exception as e:
+        db.rollback()
+        raise e
+
+def _stats_scope(client_id):
+    S = models.RequestStats
+    return [S.client_id == client_id] if client_id is not None else []
+
+def get_stats_counts(db: Session, client_id: int = None):
+    """Итоги по таблице агрегатов; client_id ограничивает статистику одним клиентом"""
+    S = models.RequestStats
+    row = db.execute(select(
+        func.coalesce(func.sum(S.request_count), 0).label("total_requests"),
+        func.coalesce(func.sum(S.completed_count), 0).label("completed_requests"),
+        func.coalesce(func.sum(S.repair_count), 0).label("count_completed"),
+        func.coalesce(func.sum(S.repair_days), 0).label("total_days"),
+    ).where(*_stats_scope(client_id))).one()
+    avg_days = float(row.total_days) / row.count_completed if row.count_completed else 0
+    return {
+        "total_requests": int(row.total_requests),
+        "completed_requests": int(row.completed_requests),
+        "count_completed": int(row.count_completed),
+        "total_days": int(row.total_days),
+        "avg_repair_days": round(avg_days, 1),
+    }
+
+def get_stats_by_tech(db: Session, client_id: int = None):
+    S = models.RequestStats
+    total = func.sum(S.request_count)
+    rows = db.query(S.tech_type, total).filter(*_stats_scope(client_id)) \
+        .group_by(S.tech_type).having(total > 0).order_by(total.desc()).all()
+    return [{"tech_type": r[0], "count": int(r[1])} for r in rows]
+
+def get_stats_by_problem_type(db: Session, client_id: int = None):
+    """Заявки по категориям неисправности: GROUP BY по колонке, заполненной при записи"""
+    R = models.Request
+    total = func.count()
+    query = select(R.problem_category, total).group_by(R.problem_category) \
+        .order_by(total.desc(), R.problem_category)
+    if client_id is not None:
+        query = query.where(R.client_id == client_id)
+    return [{"problem_type": category or classify.UNCLASSIFIED, "count": count}
+            for category, count in db.execute(query)]
+
+def get_stats_summary(db: Session, client_id: int = None):
+    """Сводная статистика по заявкам одним SQL-запросом.
+
+    Счётчики и разбивка по типам техники берутся из таблицы агрегатов
+    request_stats. Медиану и 90-й перцентиль из сумм не получить, поэтому они
+    считаются по завершённым заявкам в подзапросе того же запроса.
+    """
+    S = models.RequestStats
+    R = models.Request
+    scope = _stats_scope(client_id)
+
+    days = R.completion_date - R.start_date
+    percentiles = select(
+        func.percentile_cont(0.5).within_group(days).label("median"),
+        func.percentile_cont(0.9).within_group(days).label("p90"),
+    ).where(R.completion_date.isnot(None), days >= 0)
+    if client_id is not None:
+        percentiles = percentiles.where(R.client_id == client_id)
+    percentiles = percentiles.subquery()
+
+    by_tech = select(S.tech_type, func.sum(S.request_count).label("count")).where(*scope) \
+        .group_by(S.tech_type).having(func.sum(S.request_count) > 0).subquery()
+    by_tech_json = select(func.coalesce(
+        func.json_agg(aggregate_order_by(
+            func.json_build_object("tech_type", by_tech.c.tech_type, "count", by_tech.c.count),
+            by_tech.c.count.desc())),
+        literal_column("'[]'::json"),
+    )).scalar_subquery()
+
+    totals = select(
+        func.coalesce(func.sum(S.request_count), 0).label("total_requests"),
+        func.coalesce(func.sum(S.completed_count), 0).label("completed_requests"),
+        func.coalesce(func.sum(S.repair_count), 0).label("count_completed"),
+        func.coalesce(func.sum(S.repair_days), 0).label("total_days"),
+    ).where(*scope).subquery()
+
+    # Оба подзапроса возвращают ровно одну строку, поэтому соединение без условия
+    stmt = select(totals, percentiles.c.median, percentiles.c.p90, by_tech_json.label("by_tech")) \
+        .select_from(totals.join(percentiles, true()))
+    row = db.execute(stmt).one()
+    avg_days = float(row.total_days) / row.count_completed if row.count_completed else 0
+    return {
+        "total_requests": int(row.total_requests),
+        "completed_requests": int(row.completed_requests),
+        "count_completed": int(row.count_completed),
+        "total_days": int(row.total_days),
+        "avg_repair_days": round(avg_days, 1),
+        "median_repair_days": round(float(row.median or 0), 1),
+        "p90_repair_days": round(float(row.p90 or 0), 1),
+        "by_tech": row.by_tech,
+    }
+
+# Шаги временного ряда статистики - единицы date_trunc PostgreSQL
+TIMESERIES_BUCKETS = ("day", "week", "month")
+TIMESERIES_MAX_POINTS = 1000
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+def bucket_start(day: date, bucket: str) -> date:
+    """Начало шага, как у date_trunc: неделя с понедельника, месяц с первого числа"""
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+def next_bucket(start: date, bucket: str) -> date:
+    if bucket == "week":
+        return start + timedelta(days=7)
+    if bucket == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+def count_buckets(date_from: date, date_to: date, bucket: str) -> int:
+    first, last = bucket_start(date_from, bucket), bucket_start(date_to, bucket)
+    if bucket == "month":
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    return (last - first).days // (7 if bucket == "week" else 1) + 1
+
+def get_stats_timeseries(db: Session, date_from: date, date_to: date, bucket: str = "week",
+                         tech_type: str = None, master_id: int = None, client_id: int = None):
+    """Временной ряд по шагам bucket одним SQL-запросом.
+
+    Для каждого шага: поступило (start_date в шаге), завершено (completion_date
+    в шаге), в работе на конец шага и 50-й/90-й перцентили длительности ремонта
+    заявок, завершённых в шаге. Шаги без заявок тоже возвращаются. Остаток в
+    работе - незакрытые на начало периода плюс накопленная разность
+    поступивших и завершённых (оконная сумма). Диапазоны по start_date и
+    completion_date читаются индексами ix_requests_start_date и
+    ix_requests_completion_date.
+    """
+    R = models.Request
+    first = bucket_start(date_from, bucket)
+    end = next_bucket(bucket_start(date_to, bucket), bucket)
+    filters = []
+    if tech_type is not None:
+        filters.append(R.tech_type == tech_type)
+    if master_id is not None:
+        filters.append(R.master_id == master_id)
+    if client_id is not None:
+        filters.append(R.client_id == client_id)
+
+    def truncated(column):
+        return cast(func.date_trunc(bucket, cast(column, DateTime)), Date).label("bucket")
+
+    # bucket проверен по TIMESERIES_BUCKETS, поэтому подставляется в интервал как есть
+    steps = select(cast(func.generate_series(
+        cast(first, DateTime), cast(end - timedelta(days=1), DateTime), literal_column(f"interval '1 {bucket}'"),
+    ), Date).label("bucket")).subquery("steps")
+
+    started = truncated(R.start_date)
+    intake = select(started, func.count().label("intake")) \
+        .where(R.start_date >= first, R.start_date < end, *filters).group_by(started).subquery("intake")
+
+    days = R.completion_date - R.start_date
+    valid_days = case((days >= 0, days))
+    completed = truncated(R.completion_date)
+    done = select(
+        completed,
+        func.count().label("completions"),
+        func.percentile_cont(0.5).within_group(valid_days).label("p50"),
+        func.percentile_cont(0.9).within_group(valid_days).label("p90"),
+    ).where(R.completion_date >= first, R.completion_date < end, *filters).group_by(completed).subquery("done")
+
+    opening = select(func.count()).where(
+        R.start_date < first, or_(R.completion_date.is_(None), R.completion_date >= first), *filters,
+    ).scalar_subquery()
+
+    intake_count = func.coalesce(intake.c.intake, 0)
+    done_count = func.coalesce(done.c.completions, 0)
+    stmt = select(
+        steps.c.bucket,
+        intake_count.label("intake"),
+        done_count.label("completions"),
+        (opening + func.sum(intake_count - done_count).over(order_by=steps.c.bucket)).label("backlog"),
+        done.c.p50,
+        done.c.p90,
+    ).select_from(
+        steps.outerjoin(intake, intake.c.bucket == steps.c.bucket).outerjoin(done, done.c.bucket == steps.c.bucket)
+    ).order_by(steps.c.bucket)
+
+    return [
+        {
+            "bucket_start": row.bucket,
+            "intake": int(row.intake),
+            "completions": int(row.completions),
+            "backlog": int(row.backlog),
+            "p50_repair_days": round(float(row.p50), 1) if row.p50 is not None else None,
+            "p90_repair_days": round(float(row.p90), 1) if row.p90 is not None else None,
+        }
+        for row in db.execute(stmt)
+    ]
+
+def _missing_users(db: Session, user_ids) -> set:
+    """Какие из указанных id пользователей отсутствуют в БД (один запрос)"""
+    user_ids = {u for u in user_ids if u is not None}
+    if not user_ids:
+        return set()
+    found = db.execute(select(models.User.user_id).where(
+        models.User.user_id == any_(bindparam("user_ids", list(user_ids), type_=ARRAY(Integer)))
+    )).scalars()
+    return user_ids - set(found)
+
+def create_requests_bulk(db: Session, requests: list):
+    """Создать заявки одним многострочным INSERT ... RETURNING.
+
+    Элементы со ссылками на несуществующих пользователей не вставляются и
+    получают статус error; остальные создаются в одной транзакции.
+    """
+    missing = _missing_users(db, [r.client_id for r in requests] + [r.master_id for r in requests])
+    results, values, positions = [], [], []
+    for index, item in enumerate(requests):
+        bad = [f for f in ("client_id", "master_id") if getattr(item, f) in missing]
+        if bad:
+            results.append(schemas.BulkItemResult(
+                index=index, status="error",
+                detail="Пользователь не найден: " + ", ".join(f"{f}={getattr(item, f)}" for f in bad)))
+        else:
+            results.append(None)
+            values.append(classify.with_problem_category(item.dict()))
+            positions.append(index)
+
+    try:
+        if values:
+            created = db.scalars(
+                insert(models.Request).returning(models.Request, sort_by_parameter_order=True), values
+            ).all()
+            rollup.apply(db, after=[rollup.snapshot(r) for r in created])
+            for index, db_request in zip(positions, created):
+                results[index] = schemas.BulkItemResult(
+                    index=index, status="created", request_id=db_request.request_id,
+                    request=schemas.RequestOut.model_validate(db_request))
+        db.commit()
+        return results
+    except Exception as e:
+        db.rollback()
+        raise e
+
+def update_requests_bulk(db: Session, items: list):
+    """Изменить заявки множественным UPDATE ... WHERE request_id = ANY(...) RETURNING.
+
+    Элементы с одинаковым набором изменений обновляются одним запросом, поэтому
+    переназначение очереди мастера - это один UPDATE независимо от её длины.
+    """
+    R = models.Request
+    ids = list({item.request_id for item in items})
+    missing = _missing_users(db, [getattr(i, f, None) for i in items for f in ("client_id", "master_id")
+                                  if f in i.model_fields_set])
+
+    # Старые значения полей, влияющих на агрегаты статистики; строки блокируются до конца транзакции
+    before = {
+        row.request_id: row for row in db.execute(
+            select(R.request_id, R.client_id, R.tech_type, R.request_status, R.start_date, R.completion_date)
+            .where(R.request_id == any_(bindparam("ids", ids, type_=ARRAY(Integer))))
+            .with_for_update()
+        )
+    }
+
+    results = [None] * len(items)
+    groups = {}
+    for index, item in enumerate(items):
+        changes = classify.with_problem_category(item.dict(exclude_unset=True))
+        changes.pop("request_id", None)
+        bad = [f for f in ("client_id", "master_id") if f in changes and changes[f] in missing]
+        if item.request_id not in before:
+            results[index] = schemas.BulkItemResult(index=index, status="not_found",
+                                                    request_id=item.request_id, detail="Заявка не найдена")
+        elif bad:
+            results[index] = schemas.BulkItemResult(
+                index=index, status="error", request_id=item.request_id,
+                detail="Пользователь не найден: " + ", ".join(f"{f}={changes[f]}" for f in bad))
+        elif not changes:
+            results[index] = schemas.BulkItemResult(index=index, status="error", request_id=item.request_id,
+                                                    detail="Нет изменений")
+        else:
+            groups.setdefault(tuple(sorted(changes.items())), []).append(index)
+
+    try:
+        after = {}
+        for key, indexes in groups.items():
+            group_ids = [items[i].request_id for i in indexes]
+            updated = db.scalars(
+                update(R)
+                .where(R.request_id == any_(bindparam("ids", group_ids, type_=ARRAY(Integer))))
+                .values(**dict(key), version=R.version + 1)
+                .returning(R),
+                execution_options={"synchronize_session": False, "populate_existing": True},
+            ).all()
+            for db_request in updated:
+                after[db_request.request_id] = schemas.RequestOut.model_validate(db_request)
+            events.notify_request_changes(db, updated, dict(key))
+
+        rollup.apply(db, before=[rollup.snapshot(before[i]) for i in after],
+                     after=[rollup.snapshot(r) for r in after.values()])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise e
+
+    for indexes in groups.values():
+        for index in indexes:
+            request_id = items[index].request_id
+            results[index] = schemas.BulkItemResult(index=index, status="updated", request_id=request_id,
+                                                    request=after[request_id])
+    return results
+
+def get_users(db: Session, skip: int = 0, limit: int = 100, cursor: str = None, columns: tuple = None):
+    return paginate(_list_query(db, models.User, columns), [models.User.user_id],
+                    cursor=cursor, limit=limit, skip=skip)
 
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.user_id == user_id).first()
@@ -62,16 +554,67 @@ def create_user(db: Session, user: schemas.UserCreate):
         db.rollback()
         raise e
 
+def update_user(db: Session, user_id: int, update_data: dict):
+    """Изменить пользователя одним UPDATE ... RETURNING (пароль уже захеширован)"""
+    U = models.User
+    if not update_data:
+        return get_user(db, user_id)
+    try:
+        db_user = db.scalars(
+            update(U).where(U.user_id == user_id)
+            .values(**update_data, version=U.version + 1)
+            .returning(U),
+            execution_options=RETURNING_OPTIONS,
+        ).first()
+        if db_user is None:
+            db.rollback()
+            return None
+        events.notify_user_changed(db, user_id)
+        return _commit_detached(db, db_user)
+    except Exception as e:
+        db.rollback()
+        raise e
+
 def delete_user(db: Session, user_id: int):
-    db_user = get_user(db, user_id)
-    if not db_user:
-        return None
-    db.delete(db_user)
-    db.commit()
-    return db_user
+    """Удалить пользователя одним DELETE ... RETURNING и перенести его агрегаты"""
+    U, R = models.User, models.Request
+    try:
+        # ON DELETE SET NULL не меняет version, и клиент с сохранённым ETag получил бы 304
+        # с удалённым заказчиком или мастером, поэтому ссылки обнуляются заранее с новой версией.
+        # Комментарии мастера удаляются каскадом и из списков пропадают сами
+        for field in ("client_id", "master_id"):
+            detached = db.execute(
+                update(R).where(getattr(R, field) == user_id)
+                .values({field: None, "version": R.version + 1})
+                .returning(*(getattr(R, f) for f in events.PAYLOAD_FIELDS)),
+                execution_options={"synchronize_session": False},
+            ).all()
+            events.notify_request_changes(db, detached, (field,))
+        db_user = db.scalars(
+            delete(U).where(U.user_id == user_id).returning(U),
+            execution_options=RETURNING_OPTIONS,
+        ).first()
+        if db_user is None:
+            db.rollback()
+            return None
+        rollup.detach_client(db, user_id)
+        events.notify_user_changed(db, user_id)
+        return _commit_detached(db, db_user)
+    except Exception as e:
+        db.rollback()
+        raise e
 
-def get_comments(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Comment).offset(skip).limit(limit).all()
+def get_comments(db: Session, skip: int = 0, limit: int = 100, cursor: str = None, columns: tuple = None):
+    return paginate(_list_query(db, models.Comment, columns), [models.Comment.comment_id],
+                    cursor=cursor, limit=limit, skip=skip)
+
+def get_request_comments(db: Session, request_id: int, master_id: int = None,
+                         limit: int = 100, cursor: str = None):
+    query = db.query(models.Comment).filter(models.Comment.request_id == request_id)
+    if master_id is not None:
+        query = query.filter(models.Comment.master_id == master_id)
+    return paginate(query, [models.Comment.created_at, models.Comment.comment_id],
+                    cursor=cursor, limit=limit)
 
 def get_comment(db: Session, comment_id: int):
     return db.query(models.Comment).filter(models.Comment.comment_id == comment_id).first()
@@ -88,9 +631,17 @@ def create_comment(db: Session, comment: schemas.CommentCreate):
         raise e
 
 def delete_comment(db: Session, comment_id: int):
-    db_comment = get_comment(db, comment_id)
-    if not db_comment:
-        return None
-    db.delete(db_comment)
-    db.commit()
-    return db_comment
\ No newline at end of file
+    """Удалить комментарий одним DELETE ... RETURNING"""
+    C = models.Comment
+    try:
+        db_comment = db.scalars(
+            delete(C).where(C.comment_id == comment_id).returning(C),
+            execution_options=RETURNING_OPTIONS,
+        ).first()
+        if db_comment is None:
+            db.rollback()
+            return None
+        return _commit_detached(db, db_comment)
+    except Exception as e:
+        db.rollback()
+        raise e
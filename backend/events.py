@@ -0,0 +1,175 @@
+"""Изменения заявок для заказчиков: PostgreSQL LISTEN/NOTIFY и Server-Sent Events.
+Тем же соединением между процессами API рассылаются сбросы кэша токенов.
+
+Запись: crud.update_request (через него же идут назначение мастера и продление
+срока) и crud.update_requests_bulk вызывают notify_request_changes, если
+изменились статус, дата завершения, срок или мастер. pg_notify выполняется в
+той же транзакции, поэтому уведомление уходит только после COMMIT, а при
+откате не уходит совсем.
+
+Чтение: в каждом процессе API одно соединение psycopg2 выполняет LISTEN и
+читается циклом событий (loop.add_reader), без отдельного потока и без
+соединения из пула. RequestEventHub раскладывает уведомления по очередям
+подписчиков с тем же client_id, GET /client/my-requests/events отдаёт очередь
+потоком SSE. Соединение открывается при первом подписчике и переоткрывается
+после обрыва; уведомления за время обрыва потеряны, поэтому подписчики
+получают событие resync и перечитывают заявки сами.
+
+Сбросы кэша токенов: crud.update_user и crud.delete_user уведомляют канал
+USER_CHANNEL, и каждый процесс удаляет записи пользователя из auth.token_cache.
+Поэтому соединение открывается при старте приложения (hub.start), а не при
+первом подписчике. Пока его нет, кэш токенов работает с коротким сроком
+(auth.TOKEN_CACHE_FALLBACK_TTL).
+"""
+import asyncio
+import json
+import logging
+from datetime import date
+import psycopg2
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from .auth import token_cache
+from .database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "request_changes"
+USER_CHANNEL = "user_changes"
+# Поля, изменение которых заказчик видит на своих страницах
+NOTIFY_FIELDS = ("request_status", "completion_date", "deadline_date", "master_id")
+PAYLOAD_FIELDS = ("request_id", "client_id", *NOTIFY_FIELDS, "version")
+
+SUBSCRIBER_QUEUE_SIZE = 100
+HEARTBEAT_INTERVAL = 15
+RECONNECT_DELAY = 5
+
+def _payload(db_request) -> str:
+    return json.dumps({f: getattr(db_request, f) for f in PAYLOAD_FIELDS}, default=date.isoformat)
+
+def notify_request_changes(db, db_requests, changed_fields):
+    """Добавить в текущую транзакцию уведомления об изменённых заявках"""
+    if not set(changed_fields) & set(NOTIFY_FIELDS):
+        return
+    params = [{"channel": CHANNEL, "payload": _payload(r)} for r in db_requests if r.client_id is not None]
+    if params:
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), params)
+
+def notify_user_changed(db, user_id: int):
+    """Добавить в текущую транзакцию сброс кэша токенов пользователя во всех процессах"""
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": USER_CHANNEL, "payload": str(user_id)})
+
+def _listen():
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    conn.cursor().execute(f"LISTEN {CHANNEL}; LISTEN {USER_CHANNEL}")
+    return conn
+
+class RequestEventHub:
+    """Одно LISTEN-соединение на процесс и очереди подписчиков по client_id"""
+
+    def __init__(self):
+        self.subscribers = {}
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def subscribe(self, client_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers.setdefault(client_id, set()).add(queue)
+        self.start()
+        return queue
+
+    def unsubscribe(self, client_id: int, queue: asyncio.Queue):
+        queues = self.subscribers.get(client_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[client_id]
+
+    def dispatch(self, payload: str):
+        """Разложить уведомление по очередям заказчика из payload"""
+        client_id = json.loads(payload).get("client_id")
+        for queue in self.subscribers.get(client_id, ()):
+            self._put(queue, "request", payload)
+
+    def _put(self, queue: asyncio.Queue, event: str, data: str):
+        try:
+            queue.put_nowait((event, data))
+        except asyncio.QueueFull:
+            # Подписчик не успевает читать: пропущенное заменяет одно событие resync
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(("resync", "{}"))
+
+    def _resync_all(self):
+        for queues in self.subscribers.values():
+            for queue in queues:
+                self._put(queue, "resync", "{}")
+
+    def _read(self, conn, lost: asyncio.Future):
+        try:
+            conn.poll()
+        except psycopg2.Error as e:
+            if not lost.done():
+                lost.set_result(e)
+            return
+        while conn.notifies:
+            notify = conn.notifies.pop(0)
+            if notify.channel == USER_CHANNEL:
+                token_cache.invalidate_user(int(notify.payload))
+            else:
+                self.dispatch(notify.payload)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        connected_before = False
+        while True:
+            try:
+                conn = await run_in_threadpool(_listen)
+            except psycopg2.Error:
+                logger.exception("LISTEN %s: нет соединения, повтор через %s с", CHANNEL, RECONNECT_DELAY)
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            token_cache.set_synced(True)
+            if connected_before:
+                self._resync_all()
+            connected_before = True
+
+            lost = loop.create_future()
+            loop.add_reader(conn.fileno(), self._read, conn, lost)
+            try:
+                error = await lost
+                logger.warning("LISTEN %s: соединение потеряно (%s), переподключение", CHANNEL, error)
+            finally:
+                token_cache.set_synced(False)
+                loop.remove_reader(conn.fileno())
+                conn.close()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+hub = RequestEventHub()
+
+async def stream(client_id: int):
+    """Тело ответа SSE: события заявок заказчика и комментарии-пинги против таймаутов прокси"""
+    queue = hub.subscribe(client_id)
+    try:
+        yield f"retry: {RECONNECT_DELAY * 1000}\n\n"
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield f"event: {event}\ndata: {data}\n\n"
+    finally:
+        hub.unsubscribe(client_id, queue)
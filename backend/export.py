@@ -0,0 +1,75 @@
+"""Потоковая выгрузка заявок и комментариев в CSV (формат data/inputData*.csv) и NDJSON.
+
+Строки читаются серверным курсором пачками по EXPORT_BATCH_SIZE и сразу
+отдаются клиенту, поэтому память не зависит от размера таблицы.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from sqlalchemy import select, cast, Date
+from . import models
+from .database import SessionLocal
+from .importer import TABLES
+
+EXPORT_BATCH_SIZE = 1000
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+def requests_query(date_from: date = None, date_to: date = None, status: str = None):
+    R = models.Request
+    columns = [getattr(R, c) for c in TABLES["requests"]["columns"].values()]
+    stmt = select(*columns).order_by(R.request_id)
+    if date_from is not None:
+        stmt = stmt.where(R.start_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(R.start_date <= date_to)
+    if status is not None:
+        stmt = stmt.where(R.request_status == status)
+    return stmt
+
+def comments_query(date_from: date = None, date_to: date = None):
+    C = models.Comment
+    columns = [getattr(C, c) for c in TABLES["comments"]["columns"].values()]
+    stmt = select(*columns).order_by(C.comment_id)
+    if date_from is not None:
+        stmt = stmt.where(cast(C.created_at, Date) >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(cast(C.created_at, Date) <= date_to)
+    return stmt
+
+def _csv_value(value):
+    if value is None:
+        return "null"
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+def stream_rows(table: str, stmt, fmt: str):
+    """Генератор фрагментов выгрузки; сессия живёт, пока клиент читает ответ"""
+    headers = list(TABLES[table]["columns"])
+    columns = list(TABLES[table]["columns"].values())
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE))
+        if fmt == "csv":
+            buf = io.StringIO()
+            writer = csv.writer(buf, delimiter=";")
+            writer.writerow(headers)
+            for batch in result.partitions():
+                writer.writerows([_csv_value(v) for v in row] for row in batch)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            if buf.tell():
+                yield buf.getvalue()
+        else:
+            for batch in result.partitions():
+                yield "".join(
+                    json.dumps(dict(zip(columns, map(_json_value, row))), ensure_ascii=False) + "\n"
+                    for row in batch
+                )
+    finally:
+        db.close()
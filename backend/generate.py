@@ -0,0 +1,407 @@
+"""Генератор синтетических данных для проверок на больших объёмах.
+
+Словари берутся из начальных файлов data/inputData*.csv: роли, ФИО, типы
+техники (с частотами как в файле), модели, описания неисправностей, статусы,
+запчасти и тексты комментариев. Распределения:
+  - роли - доли ROLE_SHARES, остальные пользователи - заказчики;
+  - клиенты и мастера выбираются по закону Ципфа с показателем --skew:
+    несколько постоянных клиентов и загруженных мастеров и длинный хвост;
+  - даты начала - от --start-date до --end-date, к концу периода заявок в
+    GROWTH раз больше в день; id идут в порядке дат, как при обычной работе;
+  - ожидание мастера и длительность ремонта логнормальные: что не успело
+    завершиться к --end-date, осталось новым или в ремонте, а STUCK_SHARE
+    заявок зависла в ремонте, поэтому доля завершённых зависит от возраста;
+  - приоритет по PRIORITIES, срок выполнения (у DEADLINE_SHARE заявок)
+    зависит от приоритета;
+  - комментарии - только у заявок с мастером, число на заявку с тяжёлым
+    хвостом; обычно пишет мастер заявки.
+
+Генерация детерминирована: каждая пачка получает свой random.Random от --seed,
+таблицы и номера первой строки пачки, поэтому результат не зависит от числа
+процессов (--workers).
+
+Вывод (--target):
+    csv - inputData*.csv в каталоге --output в формате data/ (загружаются
+          backend.importer); процессы пишут части, которые затем склеиваются
+          по порядку;
+    db  - каждый процесс пишет свои пачки через COPY и фиксирует их; id
+          продолжают уже занятые, в конце выставляются последовательности,
+          пересобираются агрегаты статистики и категории неисправностей.
+
+    python -m backend.generate --output big/
+    python -m backend.generate --users 2000 --requests 100000 --comments 400000 --target db --workers 4
+"""
+import argparse
+import csv
+import io
+import math
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import date
+from itertools import accumulate
+from multiprocessing import Pool
+from sqlalchemy import text
+from . import importer
+from .database import engine
+
+CHUNK_SIZE = 50_000
+NULL = "null"
+
+# Столбцы каждой таблицы в порядке вывода; имена - как в заголовках data/inputData*.csv
+HEADERS = {
+    "users": ("userID", "fio", "phone", "login", "password", "type"),
+    "requests": ("requestID", "startDate", "homeTechType", "homeTechModel", "problemDescryption",
+                 "requestStatus", "completionDate", "repairParts", "masterID", "clientID",
+                 "deadlineDate", "priority"),
+    "comments": ("commentID", "message", "masterID", "requestID"),
+}
+
+# Доли ролей среди пользователей; все остальные - CLIENT_ROLE
+ROLE_SHARES = {"Менеджер": 0.002, "Оператор": 0.02, "Мастер": 0.05}
+CLIENT_ROLE = "Заказчик"
+MASTER_ROLE = "Мастер"
+NEW_STATUS = "Новая заявка"
+
+# Во сколько раз заявок в день больше в конце периода, чем в начале
+GROWTH = 3.0
+# Медиана (дни) и разброс логнормальных распределений
+ASSIGN_DAYS = (1.0, 1.0)
+REPAIR_DAYS = (5.0, 0.8)
+STUCK_SHARE = 0.02
+REPAIR_PARTS_SHARE = 0.3
+# Приоритет: (доля заявок, срок выполнения в днях)
+PRIORITIES = {"Срочный": (0.05, 2), "Высокий": (0.15, 5), "Нормальный": (0.7, 14), "Низкий": (0.1, 30)}
+DEADLINE_SHARE = 0.6
+# Показатель хвоста Парето для числа комментариев на заявку
+COMMENT_TAIL = 2.5
+OWN_MASTER_COMMENT_SHARE = 0.9
+
+def read_seed(seed_dir: str, table: str) -> list:
+    path = os.path.join(seed_dir, importer.TABLES[table]["file"])
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f, delimiter=";"))
+
+def model_template(model: str) -> tuple:
+    """'Redmond RT-437 черный' -> ('Redmond', 'RT-', 'черный'); номер модели генерируется"""
+    words = model.split()
+    series = re.match(r"\D*", words[1]).group() if len(words) > 1 else ""
+    color = words[-1] if len(words) > 2 else ""
+    return words[0], series, color
+
+def _unique(values) -> list:
+    return list(dict.fromkeys(v for v in values if v))
+
+class Vocabulary:
+    """Словари и частоты из начальных CSV"""
+
+    def __init__(self, seed_dir: str):
+        users = read_seed(seed_dir, "users")
+        requests = read_seed(seed_dir, "requests")
+        comments = read_seed(seed_dir, "comments")
+
+        self.roles = _unique(u["type"] for u in users)
+        missing = [r for r in (CLIENT_ROLE, MASTER_ROLE, *ROLE_SHARES) if r not in self.roles]
+        if missing:
+            raise ValueError(f"В начальных данных нет ролей: {', '.join(missing)}")
+
+        # Части ФИО раздельно по полу (по отчеству), чтобы не смешивать мужские и женские
+        names = {"f": ([], [], []), "m": ([], [], [])}
+        for u in users:
+            parts = u["fio"].split()
+            if len(parts) == 3:
+                for bucket, part in zip(names["f" if parts[2].endswith("на") else "m"], parts):
+                    if part not in bucket:
+                        bucket.append(part)
+        self.names = [parts for parts in names.values() if all(parts)]
+
+        tech_counts = Counter(r["homeTechType"] for r in requests)
+        self.tech_types = list(tech_counts)
+        self.tech_weights = list(tech_counts.values())
+        self.models = defaultdict(list)
+        self.problems = defaultdict(list)
+        self.parts = defaultdict(list)
+        done, statuses = set(), set()
+        for r in requests:
+            tech = r["homeTechType"]
+            self.models[tech].append(model_template(r["homeTechModel"]))
+            if r["problemDescryption"] not in self.problems[tech]:
+                self.problems[tech].append(r["problemDescryption"])
+            if r["repairParts"] and r["repairParts"] != NULL and r["repairParts"] not in self.parts[tech]:
+                self.parts[tech].append(r["repairParts"])
+            statuses.add(r["requestStatus"])
+            if r["completionDate"] != NULL:
+                done.add(r["requestStatus"])
+        self.done_statuses = sorted(done)
+        self.progress_statuses = sorted(statuses - done - {NEW_STATUS})
+        if NEW_STATUS not in statuses or not self.done_statuses or not self.progress_statuses:
+            raise ValueError("В начальных заявках нужны новые, незавершённые и завершённые статусы")
+
+        self.messages = _unique(c["message"] for c in comments)
+        if not self.messages:
+            raise ValueError("В начальных данных нет комментариев")
+
+def user_roles(seed: int, users: int, vocab: Vocabulary) -> list:
+    roles = list(ROLE_SHARES) + [CLIENT_ROLE]
+    weights = list(ROLE_SHARES.values()) + [1 - sum(ROLE_SHARES.values())]
+    return random.Random(f"{seed}:roles").choices(roles, weights, k=users)
+
+def skewed(ids: list, skew: float, rng: random.Random) -> tuple:
+    """Случайный порядок id и накопленные веса Ципфа для random.choices"""
+    ids = list(ids)
+    rng.shuffle(ids)
+    return ids, list(accumulate(1 / (rank + 1) ** skew for rank in range(len(ids))))
+
+def _iso(day: int) -> str:
+    return date.fromordinal(day).isoformat() if day is not None else NULL
+
+def _lognormal_days(rng: random.Random, median_sigma: tuple) -> int:
+    median, sigma = median_sigma
+    return int(rng.lognormvariate(math.log(median), sigma))
+
+def _start_position(i: int, total: int) -> float:
+    """Доля периода для i-й заявки при плотности, растущей линейно от 1 до GROWTH"""
+    u = (i + 0.5) / total
+    if GROWTH == 1:
+        return u
+    return (math.sqrt(1 + (GROWTH ** 2 - 1) * u) - 1) / (GROWTH - 1)
+
+def _share(total: int, i: int, of: int) -> int:
+    """Сколько из total приходится на первые i из of строк; даёт границы id без пропусков"""
+    return total * i // of
+
+_state = {}
+
+def _init_worker(plan: dict):
+    # Соединения пула, унаследованные от родителя, в дочернем процессе не используются
+    engine.dispose(close=False)
+    vocab = Vocabulary(plan["seed_dir"])
+    roles = user_roles(plan["seed"], plan["users"], vocab)
+    ids = {role: [plan["user_offset"] + i + 1 for i, r in enumerate(roles) if r == role]
+           for role in (CLIENT_ROLE, MASTER_ROLE)}
+    _state.update(
+        plan=plan, vocab=vocab, roles=roles, connection=None,
+        clients=skewed(ids[CLIENT_ROLE], plan["skew"], random.Random(f"{plan['seed']}:clients")),
+        masters=skewed(ids[MASTER_ROLE], plan["skew"], random.Random(f"{plan['seed']}:masters")),
+    )
+
+def _chunk_rng(table: str, first: int) -> random.Random:
+    return random.Random(f"{_state['plan']['seed']}:{table}:{first}")
+
+def user_rows(first: int, last: int) -> list:
+    plan, vocab, roles = _state["plan"], _state["vocab"], _state["roles"]
+    rng = _chunk_rng("users", first)
+    rows = []
+    for i in range(first, last):
+        user_id = plan["user_offset"] + i + 1
+        surnames, names, patronymics = rng.choice(vocab.names)
+        fio = f"{rng.choice(surnames)} {rng.choice(names)} {rng.choice(patronymics)}"
+        rows.append((user_id, fio, f"89{rng.randrange(10 ** 9):09d}", f"gen{user_id}", f"pass{user_id}", roles[i]))
+    return rows
+
+def request_rows(first: int, last: int) -> tuple:
+    """Заявки first..last-1 и их комментарии; id комментариев пачки известны заранее"""
+    plan, vocab = _state["plan"], _state["vocab"]
+    rng = _chunk_rng("requests", first)
+    count, total = last - first, plan["requests"]
+    clients = rng.choices(_state["clients"][0], cum_weights=_state["clients"][1], k=count)
+    masters = rng.choices(_state["masters"][0], cum_weights=_state["masters"][1], k=count)
+    techs = rng.choices(vocab.tech_types, vocab.tech_weights, k=count)
+    priorities = rng.choices(list(PRIORITIES), [w for w, _ in PRIORITIES.values()], k=count)
+    start_ord, end_ord = plan["start_date"].toordinal(), plan["end_date"].toordinal()
+    span = end_ord - start_ord
+
+    requests, commented = [], []
+    for k in range(count):
+        i = first + k
+        request_id = plan["request_offset"] + i + 1
+        start = start_ord + min(span, max(0, round(span * _start_position(i, total)) + rng.randint(-2, 2)))
+        tech, priority = techs[k], priorities[k]
+        brand, series, color = rng.choice(vocab.models[tech])
+        model = f"{brand} {series}{rng.randint(10, 999)} {color}".rstrip()
+        deadline = start + PRIORITIES[priority][1] if rng.random() < DEADLINE_SHARE else None
+        assigned = start + _lognormal_days(rng, ASSIGN_DAYS)
+        completed = assigned + _lognormal_days(rng, REPAIR_DAYS)
+
+        master, completion, parts = None, None, ""
+        if assigned > end_ord:
+            status = NEW_STATUS
+        else:
+            master = masters[k]
+            commented.append((request_id, master))
+            if completed > end_ord or rng.random() < STUCK_SHARE:
+                status = rng.choice(vocab.progress_statuses)
+            else:
+                status, completion = rng.choice(vocab.done_statuses), completed
+                if vocab.parts[tech] and rng.random() < REPAIR_PARTS_SHARE:
+                    parts = rng.choice(vocab.parts[tech])
+        requests.append((request_id, _iso(start), tech, model, rng.choice(vocab.problems[tech]), status,
+                         _iso(completion), parts, NULL if master is None else master, clients[k],
+                         _iso(deadline), priority))
+
+    comment_first = _share(plan["comments"], first, total)
+    comment_count = _share(plan["comments"], last, total) - comment_first
+    # Если в пачке нет заявок с мастером, комментарии остаются без автора
+    targets = commented or [(row[0], NULL) for row in requests]
+    weights = [rng.paretovariate(COMMENT_TAIL) for _ in targets]
+    picked = sorted(rng.choices(targets, weights, k=comment_count))
+    comments = []
+    for n, (request_id, master) in enumerate(picked):
+        if master != NULL and rng.random() >= OWN_MASTER_COMMENT_SHARE:
+            master = rng.choices(_state["masters"][0], cum_weights=_state["masters"][1])[0]
+        comments.append((plan["comment_offset"] + comment_first + n + 1, rng.choice(vocab.messages),
+                         master, request_id))
+    return requests, comments
+
+def _csv_text(rows) -> str:
+    buf = io.StringIO(newline="")
+    csv.writer(buf, delimiter=";").writerows(rows)
+    return buf.getvalue()
+
+def _part_path(table: str, first: int) -> str:
+    return os.path.join(_state["plan"]["output"], f"{importer.TABLES[table]['file']}.part{first:012d}")
+
+def _copy(cursor, table: str, rows):
+    columns = ", ".join(importer.TABLES[table]["columns"][h] for h in HEADERS[table])
+    cursor.copy_expert(f"COPY {importer.SCHEMA}.{table} ({columns}) FROM STDIN WITH ({importer.COPY_OPTIONS})",
+                       io.StringIO(_csv_text(rows)))
+
+def _run_chunk(task: tuple) -> dict:
+    """Сгенерировать пачку и записать её; возвращает число строк по таблицам"""
+    table, first, last = task
+    if table == "users":
+        output = {"users": user_rows(first, last)}
+    else:
+        output = dict(zip(("requests", "comments"), request_rows(first, last)))
+
+    if _state["plan"]["target"] == "csv":
+        for name, rows in output.items():
+            with open(_part_path(name, first), "w", encoding="utf-8", newline="") as f:
+                f.write(_csv_text(rows))
+    else:
+        if _state["connection"] is None:
+            _state["connection"] = engine.raw_connection()
+        conn = _state["connection"]
+        try:
+            cursor = conn.cursor()
+            for name, rows in output.items():
+                _copy(cursor, name, rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return {name: len(rows) for name, rows in output.items()}
+
+def _chunks(table: str, total: int, size: int) -> list:
+    return [(table, first, min(first + size, total)) for first in range(0, total, size)]
+
+def _db_offsets() -> dict:
+    """Наибольшие занятые id: сгенерированные строки добавляются после них"""
+    with engine.connect() as conn:
+        offsets = {
+            table: conn.scalar(text(f"SELECT COALESCE(MAX({spec['key']}), 0) FROM {importer.SCHEMA}.{table}"))
+            for table, spec in importer.TABLES.items()
+        }
+    # Соединение не должно перейти в дочерние процессы
+    engine.dispose()
+    return offsets
+
+def _join_parts(output: str, tasks: dict):
+    """Склеить части каждой таблицы по порядку в один файл с заголовком"""
+    for table in importer.LOAD_ORDER:
+        parts = sorted(first for name, first, _ in tasks[table])
+        path = os.path.join(output, importer.TABLES[table]["file"])
+        with open(path, "wb") as out:
+            out.write((";".join(HEADERS[table]) + "\r\n").encode("utf-8"))
+            for first in parts:
+                part = os.path.join(output, f"{importer.TABLES[table]['file']}.part{first:012d}")
+                with open(part, "rb") as f:
+                    while chunk := f.read(1 << 20):
+                        out.write(chunk)
+                os.remove(part)
+        print(f"{path}: {os.path.getsize(path) / 2 ** 20:,.1f} МБ")
+
+def _finish_db():
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        for table in importer.LOAD_ORDER:
+            importer.resync_sequence(cursor, table)
+        conn.commit()
+    finally:
+        conn.close()
+    importer.refresh_derived()
+
+def generate(args):
+    vocab = Vocabulary(args.seed_dir)
+    roles = Counter(user_roles(args.seed, args.users, vocab))
+    if not roles[CLIENT_ROLE] or not roles[MASTER_ROLE]:
+        raise ValueError("Среди пользователей нет заказчика или мастера: увеличьте --users")
+
+    offsets = _db_offsets() if args.target == "db" else dict.fromkeys(importer.TABLES, 0)
+    plan = {
+        "seed": args.seed, "seed_dir": args.seed_dir, "target": args.target, "output": args.output,
+        "users": args.users, "requests": args.requests, "comments": args.comments, "skew": args.skew,
+        "start_date": args.start_date, "end_date": args.end_date,
+        "user_offset": offsets["users"], "request_offset": offsets["requests"],
+        "comment_offset": offsets["comments"],
+    }
+    if args.target == "csv":
+        os.makedirs(args.output, exist_ok=True)
+
+    tasks = {
+        "users": _chunks("users", args.users, args.chunk_size),
+        "requests": _chunks("requests", args.requests, args.chunk_size),
+    }
+    tasks["comments"] = [("comments", first, last) for _, first, last in tasks["requests"]]
+    totals = {"users": args.users, "requests": args.requests, "comments": args.comments}
+    started = time.perf_counter()
+    with Pool(args.workers, initializer=_init_worker, initargs=(plan,)) as pool:
+        # Пользователи целиком раньше заявок: на них ссылаются внешние ключи
+        for phase in ("users", "requests"):
+            done = Counter()
+            for counts in pool.imap_unordered(_run_chunk, tasks[phase]):
+                done.update(counts)
+                elapsed = time.perf_counter() - started
+                print("  " + ", ".join(f"{t}: {n:,}/{totals[t]:,}" for t, n in done.items())
+                      + f" ({sum(done.values()) / elapsed:,.0f} строк/с)", flush=True)
+            started = time.perf_counter()
+
+    if args.target == "csv":
+        _join_parts(args.output, tasks)
+    else:
+        _finish_db()
+
+def _date(value: str) -> date:
+    return date.fromisoformat(value)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=5_000_000)
+    parser.add_argument("--comments", type=int, default=20_000_000)
+    parser.add_argument("--seed", type=int, default=1, help="одинаковый seed - одинаковые данные")
+    parser.add_argument("--seed-dir", default="data", help="каталог с начальными inputData*.csv")
+    parser.add_argument("--target", choices=["csv", "db"], default="csv")
+    parser.add_argument("--output", default="generated", help="каталог для --target csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="процессов генерации")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="строк в пачке")
+    parser.add_argument("--skew", type=float, default=0.8, help="показатель Ципфа для клиентов и мастеров")
+    parser.add_argument("--start-date", type=_date, default=date(2019, 1, 1))
+    parser.add_argument("--end-date", type=_date, default=date(2024, 12, 31))
+    args = parser.parse_args(argv)
+    if args.users < 1 or args.requests < 0 or args.comments < 0 or args.chunk_size < 1:
+        parser.error("число строк и размер пачки не могут быть отрицательными")
+    if args.comments and not args.requests:
+        parser.error("для комментариев нужны заявки")
+    if args.start_date > args.end_date:
+        parser.error("--start-date позже --end-date")
+
+    generate(args)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Массовая загрузка CSV из data/ в service_center.* через COPY FROM STDIN.
+
+Файлы в формате data/inputData*.csv: разделитель ';', первая строка - заголовок,
+пустые значения записаны как null. Колонки сопоставляются по заголовку, поэтому
+порядок колонок в файле может быть любым, а необязательные колонки (например,
+deadlineDate и priority у заявок) можно не указывать. Файл передаётся в PostgreSQL потоком,
+без разбора в Python, так что объём файла на память не влияет.
+
+Таблицы грузятся в порядке внешних ключей: users, requests, comments.
+Режимы:
+    copy   - COPY прямо в таблицу (быстрее всего, конфликт ключей - ошибка);
+    upsert - COPY во временную таблицу и INSERT ... ON CONFLICT DO UPDATE.
+
+После загрузки последовательности первичных ключей выставляются на MAX(id),
+таблица агрегатов статистики пересобирается, а новым заявкам и заявкам с
+изменённым описанием назначается категория неисправности (classify.backfill).
+
+    python -m backend.importer data/
+    python -m backend.importer data/ --mode upsert --only requests comments
+"""
+import argparse
+import os
+import sys
+import time
+from . import rollup, classify
+from .database import engine, SessionLocal
+
+SCHEMA = "service_center"
+
+# Таблица, ключ, файл по умолчанию и сопоставление заголовков CSV колонкам БД
+TABLES = {
+    "users": {
+        "key": "user_id",
+        "file": "inputDataUsers.csv",
+        "columns": {
+            "userID": "user_id", "fio": "fio", "phone": "phone", "login": "login",
+            "password": "password", "type": "user_type",
+        },
+    },
+    "requests": {
+        "key": "request_id",
+        "file": "inputDataRequests.csv",
+        "columns": {
+            "requestID": "request_id", "startDate": "start_date", "homeTechType": "tech_type",
+            "homeTechModel": "tech_model", "problemDescryption": "problem_description",
+            "requestStatus": "request_status", "completionDate": "completion_date",
+            "repairParts": "repair_parts", "masterID": "master_id", "clientID": "client_id",
+            "deadlineDate": "deadline_date", "priority": "priority",
+        },
+    },
+    "comments": {
+        "key": "comment_id",
+        "file": "inputDataComments.csv",
+        "columns": {
+            "commentID": "comment_id", "message": "message", "masterID": "master_id",
+            "requestID": "request_id",
+        },
+    },
+}
+LOAD_ORDER = ("users", "requests", "comments")
+
+# Колонки, вычисляемые из загружаемых: при upsert сбрасываются в NULL, если
+# исходная колонка изменилась, и пересчитываются в refresh_derived
+DERIVED_COLUMNS = {"problem_description": "problem_category"}
+
+COPY_OPTIONS = "FORMAT csv, DELIMITER ';', NULL 'null', ENCODING 'UTF8'"
+
+class ProgressReader:
+    """Файл для copy_expert, который считает прочитанные строки и печатает скорость"""
+
+    def __init__(self, f, label: str, interval: float = 2.0):
+        self.f = f
+        self.label = label
+        self.interval = interval
+        self.rows = 0
+        self.started = self.reported = time.perf_counter()
+
+    def read(self, size=-1):
+        chunk = self.f.read(size)
+        self.rows += chunk.count(b"\n")
+        now = time.perf_counter()
+        if now - self.reported >= self.interval:
+            self.reported = now
+            print(f"  {self.label}: {self.rows:,} строк, {self.rows / (now - self.started):,.0f} строк/с",
+                  flush=True)
+        return chunk
+
+def read_header(f, table: str) -> list:
+    """Прочитать заголовок CSV и вернуть список колонок БД в порядке файла"""
+    header = f.readline().decode("utf-8-sig").strip().split(";")
+    mapping = TABLES[table]["columns"]
+    unknown = [h for h in header if h not in mapping]
+    if unknown:
+        raise ValueError(f"{table}: неизвестные колонки в заголовке: {', '.join(unknown)}")
+    return [mapping[h] for h in header]
+
+def load_table(cursor, table: str, path: str, mode: str) -> int:
+    target = f"{SCHEMA}.{table}"
+    with open(path, "rb") as f:
+        columns = read_header(f, table)
+        column_list = ", ".join(columns)
+        reader = ProgressReader(f, table)
+
+        if mode == "copy":
+            cursor.copy_expert(f"COPY {target} ({column_list}) FROM STDIN WITH ({COPY_OPTIONS})", reader)
+            loaded = cursor.rowcount
+        else:
+            staging = f"staging_{table}"
+            cursor.execute(f"CREATE TEMP TABLE {staging} (LIKE {target} INCLUDING DEFAULTS) ON COMMIT DROP")
+            cursor.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN WITH ({COPY_OPTIONS})", reader)
+            key = TABLES[table]["key"]
+            updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c != key)
+            # Перезаписанные строки получают новую версию, иначе клиенты сохранят старые ETag
+            updates += ", version = t.version + 1, updated_at = now()"
+            for source, derived in DERIVED_COLUMNS.items():
+                if source in columns:
+                    updates += (f", {derived} = CASE WHEN t.{source} IS DISTINCT FROM EXCLUDED.{source} "
+                                f"THEN NULL ELSE t.{derived} END")
+            cursor.execute(
+                f"INSERT INTO {target} AS t ({column_list}) SELECT {column_list} FROM {staging} "
+                f"ON CONFLICT ({key}) DO UPDATE SET {updates}"
+            )
+            loaded = cursor.rowcount
+
+    elapsed = time.perf_counter() - reader.started
+    print(f"{table}: загружено {loaded:,} строк за {elapsed:.2f} с "
+          f"({loaded / elapsed if elapsed else 0:,.0f} строк/с)", flush=True)
+    return loaded
+
+def resync_sequence(cursor, table: str):
+    """Выставить последовательность первичного ключа после явной загрузки id"""
+    key = TABLES[table]["key"]
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{SCHEMA}.{table}', '{key}'), "
+        f"COALESCE(MAX({key}), 1), MAX({key}) IS NOT NULL) FROM {SCHEMA}.{table}"
+    )
+
+def import_dir(data_dir: str, mode: str = "copy", only=None, files=None):
+    tables = [t for t in LOAD_ORDER if not only or t in only]
+    files = files or {}
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        for table in tables:
+            path = files.get(table) or os.path.join(data_dir, TABLES[table]["file"])
+            load_table(cursor, table, path, mode)
+            resync_sequence(cursor, table)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    if "requests" in tables:
+        refresh_derived()
+
+def refresh_derived():
+    """Производные данные заявок после загрузки в обход crud: агрегаты и категории"""
+    db = SessionLocal()
+    try:
+        print(f"Пересобрано строк агрегатов статистики: {rollup.rebuild(db)}")
+        print(f"Классифицировано заявок: {classify.backfill(db):,}")
+    finally:
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data_dir", nargs="?", default="data", help="каталог с inputData*.csv")
+    parser.add_argument("--mode", choices=["copy", "upsert"], default="copy")
+    parser.add_argument("--only", nargs="+", choices=LOAD_ORDER, help="загрузить только эти таблицы")
+    for table in LOAD_ORDER:
+        parser.add_argument(f"--{table}-file", help=f"файл для {table} вместо файла по умолчанию")
+    args = parser.parse_args(argv)
+
+    files = {t: getattr(args, f"{t}_file") for t in LOAD_ORDER}
+    import_dir(args.data_dir, mode=args.mode, only=args.only, files=files)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
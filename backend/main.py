@@ -1,7 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, APIRouter, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm.exc import StaleDataError
 from fastapi.middleware.cors import CORSMiddleware
-from backend.routers import users, requests, comments, auth as auth_router, client, qr
-from backend.database import Base, engine
+from backend.routers import users, requests, comments, auth as auth_router, client, qr, profiles
+from backend.database import Base, engine, DB_MODE
+from backend import events
+from backend.metrics import MetricsMiddleware, metrics_response
+from backend.profiling import ProfilingMiddleware
 import backend.models
 
 app = FastAPI(title="Service Center API", version="1.0.0")
@@ -13,19 +18,67 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Total-Count-Mode", "ETag"],
 )
+# Профилирование по ?profile=1 (внутри метрик: SQL пишется в статистику запроса)
+app.add_middleware(ProfilingMiddleware)
+# Счётчики и гистограммы по маршрутам для /metrics
+app.add_middleware(MetricsMiddleware)
+
+def with_async_routes(sync_router: APIRouter, async_router: APIRouter) -> APIRouter:
+    """Заменить маршруты на async-версии, сохранив порядок исходного роутера"""
+    overrides = {(r.path, frozenset(r.methods)): r for r in async_router.routes}
+    merged = APIRouter()
+    merged.routes = [overrides.get((r.path, frozenset(r.methods)), r) for r in sync_router.routes]
+    return merged
+
+requests_router, comments_router, client_router = requests.router, comments.router, client.router
+
+if DB_MODE == "async":
+    from backend.database import init_async_engine
+    from backend.routers import requests_async, comments_async, client_async
+    init_async_engine()
+    requests_router = with_async_routes(requests.router, requests_async.router)
+    comments_router = with_async_routes(comments.router, comments_async.router)
+    client_router = with_async_routes(client.router, client_async.router)
+
+    @app.on_event("shutdown")
+    async def dispose_async_engine():
+        from backend import database
+        await database.async_engine.dispose()
+
+@app.on_event("startup")
+async def start_events():
+    """Открыть LISTEN-соединение: через него приходят и сбросы кэша токенов"""
+    events.hub.start()
+
+@app.on_event("shutdown")
+async def stop_request_events():
+    """Закрыть LISTEN-соединение рассылки изменений заявок"""
+    await events.hub.stop()
 
 # Подключаем роутеры
 app.include_router(users.router, prefix="/users", tags=["Users"])
-app.include_router(requests.router, prefix="/requests", tags=["Requests"])
-app.include_router(comments.router, prefix="/comments", tags=["Comments"])
+app.include_router(requests_router, prefix="/requests", tags=["Requests"])
+app.include_router(comments_router, prefix="/comments", tags=["Comments"])
 app.include_router(auth_router.router, prefix="/auth", tags=["Auth"])
-app.include_router(client.router, prefix="/client", tags=["Client"])
+app.include_router(client_router, prefix="/client", tags=["Client"])
 app.include_router(qr.router, prefix="/qr", tags=["QR"])
+app.include_router(profiles.router, prefix="/debug/profiles", tags=["Debug"])
+
+@app.exception_handler(StaleDataError)
+def stale_data_handler(request: Request, exc: StaleDataError):
+    """Строку изменили параллельно (не совпала колонка version)"""
+    return JSONResponse(status_code=409, content={"detail": "Запись изменена другим пользователем, обновите страницу"})
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Метрики процесса в формате Prometheus"""
+    return metrics_response()
 
 @app.get("/")
 def root():
-    return {"message": "Service Center API", "version": "1.0.0"}
+    return {"message": "Service Center API", "version": "1.0.0", "db_mode": DB_MODE}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,110 @@
+"""Метрики API в формате Prometheus (GET /metrics).
+
+MetricsMiddleware считает запросы, коды ответов и длительность по шаблону
+маршрута (/requests/{request_id}, а не конкретный путь), а также число
+запросов к БД и время в БД на один HTTP-запрос. Запросы к БД считают
+обработчики событий движка из database.py: они добавляют данные в
+RequestStats текущего запроса через contextvar, который наследуют и пул
+потоков Starlette, и AsyncSession.run_sync.
+
+Метрики собираются в памяти процесса: при нескольких воркерах uvicorn
+каждый отдаёт свои значения, агрегирует их Prometheus.
+"""
+import time
+from contextvars import ContextVar
+from typing import Optional
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from starlette.responses import Response
+
+# Маршрут для путей, не совпавших ни с одним шаблоном (404), чтобы не плодить метки
+UNMATCHED_ROUTE = "unmatched"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DB_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+HTTP_REQUESTS = Counter(
+    "api_http_requests_total", "HTTP-запросы к API",
+    ["method", "route", "status"])
+HTTP_LATENCY = Histogram(
+    "api_http_request_duration_seconds", "Длительность обработки HTTP-запроса",
+    ["method", "route"], buckets=LATENCY_BUCKETS)
+HTTP_DB_QUERIES = Histogram(
+    "api_http_request_db_queries", "Число запросов к БД на один HTTP-запрос",
+    ["method", "route"], buckets=QUERY_COUNT_BUCKETS)
+HTTP_DB_TIME = Histogram(
+    "api_http_request_db_seconds", "Суммарное время запросов к БД на один HTTP-запрос",
+    ["method", "route"], buckets=LATENCY_BUCKETS)
+DB_QUERY_LATENCY = Histogram(
+    "api_db_query_duration_seconds", "Длительность одного запроса к БД",
+    ["engine"], buckets=DB_LATENCY_BUCKETS)
+DB_POOL_WAIT = Histogram(
+    "api_db_pool_checkout_wait_seconds", "Ожидание соединения из пула (включая открытие нового)",
+    ["engine"], buckets=DB_LATENCY_BUCKETS)
+DB_POOL_IN_USE = Gauge(
+    "api_db_pool_connections_in_use", "Соединения, выданные из пула",
+    ["engine"])
+
+class RequestStats:
+    """Запросы к БД в рамках одного HTTP-запроса.
+
+    statements - список (SQL, длительность) по порядку; ведётся только при
+    профилировании запроса (см. profiling.py), иначе None.
+    """
+    __slots__ = ("queries", "db_time", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = None
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+def record_query(engine_name: str, duration: float, statement: str = None):
+    DB_QUERY_LATENCY.labels(engine_name).observe(duration)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += duration
+        if stats.statements is not None:
+            stats.statements.append((statement, duration))
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+class MetricsMiddleware:
+    """ASGI-middleware: время считается до отправки последнего куска тела,
+    поэтому потоковые ответы (экспорт) учитываются целиком"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request.reset(token)
+            method, route = scope["method"], route_template(scope)
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            HTTP_DB_QUERIES.labels(method, route).observe(stats.queries)
+            HTTP_DB_TIME.labels(method, route).observe(stats.db_time)
+
+def metrics_response() -> Response:
+    # Content-Type заголовком: через media_type Starlette добавил бы второй charset
+    return Response(generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
@@ -0,0 +1,98 @@
+"""Версионированные миграции схемы service_center.
+
+Миграции - файлы backend/migrations/NNNN_описание.sql, применяются по порядку
+номеров, каждая в своей транзакции. Применённые версии записываются в
+service_center.schema_migrations, поэтому повторный запуск ничего не делает.
+
+    python -m backend.migrate            # применить новые миграции
+    python -m backend.migrate status     # показать применённые и ожидающие
+"""
+import argparse
+import os
+import re
+import sys
+from .database import engine
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+CREATE_VERSIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS service_center.schema_migrations (
+    version    varchar(4) PRIMARY KEY,
+    name       varchar(255) NOT NULL,
+    applied_at timestamptz NOT NULL DEFAULT now()
+)
+"""
+
+def discover(path: str = MIGRATIONS_DIR) -> list:
+    """Список (version, name, path) в порядке версий"""
+    migrations = []
+    for filename in sorted(os.listdir(path)):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((match.group(1), match.group(2), os.path.join(path, filename)))
+    versions = [m[0] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Повторяющиеся номера миграций")
+    return migrations
+
+def applied_versions(cursor) -> set:
+    cursor.execute(CREATE_VERSIONS_TABLE)
+    cursor.execute("SELECT version FROM service_center.schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+def upgrade(path: str = MIGRATIONS_DIR) -> list:
+    """Применить неприменённые миграции; возвращает их версии"""
+    conn = engine.raw_connection()
+    done = []
+    try:
+        cursor = conn.cursor()
+        applied = applied_versions(cursor)
+        conn.commit()
+        for version, name, file_path in discover(path):
+            if version in applied:
+                continue
+            with open(file_path, encoding="utf-8") as f:
+                sql = f.read()
+            try:
+                cursor.execute(sql)
+                cursor.execute(
+                    "INSERT INTO service_center.schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            print(f"Применена миграция {version}_{name}")
+            done.append(version)
+    finally:
+        conn.close()
+    return done
+
+def status(path: str = MIGRATIONS_DIR) -> list:
+    """Список (version, name, applied)"""
+    conn = engine.raw_connection()
+    try:
+        applied = applied_versions(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+    return [(version, name, version in applied) for version, name, _ in discover(path)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", choices=["upgrade", "status"], default="upgrade")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        for version, name, applied in status():
+            print(f"{version}_{name}: {'применена' if applied else 'ожидает'}")
+        return 0
+
+    done = upgrade()
+    print("Новых миграций нет" if not done else f"Применено миграций: {len(done)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
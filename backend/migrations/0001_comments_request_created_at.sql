@@ -0,0 +1,3 @@
+-- Комментарии заявки читаются одним индексным диапазоном в порядке создания
+CREATE INDEX IF NOT EXISTS ix_comments_request_id_created_at
+    ON service_center.comments (request_id, created_at, comment_id);
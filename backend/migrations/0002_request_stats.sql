@@ -0,0 +1,22 @@
+-- Агрегаты статистики (backend/rollup.py); 0 в client_id - заявки без клиента
+CREATE TABLE IF NOT EXISTS service_center.request_stats (
+    client_id       integer      NOT NULL,
+    tech_type       varchar(100) NOT NULL,
+    request_status  varchar(50)  NOT NULL,
+    request_count   integer      NOT NULL DEFAULT 0,
+    completed_count integer      NOT NULL DEFAULT 0,
+    repair_count    integer      NOT NULL DEFAULT 0,
+    repair_days     bigint       NOT NULL DEFAULT 0,
+    PRIMARY KEY (client_id, tech_type, request_status)
+);
+
+-- Начальное заполнение; если таблица уже ведётся, существующие строки не трогаем
+INSERT INTO service_center.request_stats
+SELECT coalesce(client_id, 0), tech_type, request_status,
+       count(*),
+       count(completion_date),
+       count(*) FILTER (WHERE completion_date - start_date >= 0),
+       coalesce(sum(completion_date - start_date) FILTER (WHERE completion_date - start_date >= 0), 0)
+FROM service_center.requests
+GROUP BY coalesce(client_id, 0), tech_type, request_status
+ON CONFLICT DO NOTHING;
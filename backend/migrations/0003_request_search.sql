@@ -0,0 +1,14 @@
+-- Полнотекстовый и нечёткий поиск заявок (GET /requests/search?q=)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE service_center.requests ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('russian', coalesce(tech_model, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(problem_description, '')), 'B')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_requests_search_vector
+    ON service_center.requests USING gin (search_vector);
+CREATE INDEX IF NOT EXISTS ix_requests_tech_model_trgm
+    ON service_center.requests USING gin (tech_model gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_comments_message_fts
+    ON service_center.comments USING gin (to_tsvector('russian'::regconfig, message));
@@ -0,0 +1,24 @@
+-- Списки заказчика: client_id + статус, порядок по request_id для keyset-пагинации.
+-- Заодно покрывает ON DELETE SET NULL по requests.client_id при удалении пользователя.
+CREATE INDEX IF NOT EXISTS ix_requests_client_status
+    ON service_center.requests (client_id, request_status, request_id);
+
+-- Поиск по мастеру и ON DELETE SET NULL по requests.master_id
+CREATE INDEX IF NOT EXISTS ix_requests_master_status
+    ON service_center.requests (master_id, request_status);
+
+-- Поиск по типу оборудования
+CREATE INDEX IF NOT EXISTS ix_requests_tech_type_status
+    ON service_center.requests (tech_type, request_status);
+
+-- Перцентили времени ремонта читают только завершённые заявки (index-only scan)
+CREATE INDEX IF NOT EXISTS ix_requests_completed
+    ON service_center.requests (client_id, start_date, completion_date)
+    WHERE completion_date IS NOT NULL;
+
+-- ON DELETE CASCADE по comments.master_id при удалении пользователя
+CREATE INDEX IF NOT EXISTS ix_comments_master_id
+    ON service_center.comments (master_id);
+
+ANALYZE service_center.requests;
+ANALYZE service_center.comments;
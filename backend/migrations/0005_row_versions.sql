@@ -0,0 +1,13 @@
+-- Версия и время изменения строк для ETag (backend/conditional.py).
+-- version увеличивается приложением при каждом UPDATE; существующие строки начинают с 1.
+ALTER TABLE service_center.requests
+    ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now(),
+    ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1;
+
+ALTER TABLE service_center.users
+    ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now(),
+    ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1;
+
+ALTER TABLE service_center.comments
+    ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now(),
+    ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1;
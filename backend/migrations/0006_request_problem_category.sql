@@ -0,0 +1,8 @@
+-- Категория неисправности заявки (backend/classify.py) для GET /requests/stats/by-problem-type.
+-- Новые и изменённые заявки получают её при записи; существующие строки заполняет
+-- python -m backend.classify backfill пакетами, без долгой блокировки таблицы.
+ALTER TABLE service_center.requests ADD COLUMN IF NOT EXISTS problem_category varchar(50);
+
+-- GROUP BY по категории читает только индекс; client_id - для статистики заказчика
+CREATE INDEX IF NOT EXISTS ix_requests_problem_category
+    ON service_center.requests (problem_category, client_id);
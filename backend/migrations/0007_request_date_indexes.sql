@@ -0,0 +1,12 @@
+-- Временной ряд статистики (GET /requests/stats/timeseries): диапазоны по дате начала
+-- и по дате завершения. Колонки фильтров в INCLUDE, чтобы хватало index-only scan.
+CREATE INDEX IF NOT EXISTS ix_requests_start_date
+    ON service_center.requests (start_date)
+    INCLUDE (completion_date, tech_type, master_id, client_id);
+
+CREATE INDEX IF NOT EXISTS ix_requests_completion_date
+    ON service_center.requests (completion_date)
+    INCLUDE (start_date, tech_type, master_id, client_id)
+    WHERE completion_date IS NOT NULL;
+
+ANALYZE service_center.requests;
@@ -0,0 +1,7 @@
+-- Комментарии заявки листаются по ключу (created_at, comment_id): строка с NULL в
+-- created_at не проходит условие (created_at, comment_id) > курсор и пропадала бы
+-- со всех страниц, кроме первой. Пустые значения заполняются временем изменения
+-- строки, после чего колонка становится NOT NULL.
+UPDATE service_center.comments SET created_at = updated_at WHERE created_at IS NULL;
+
+ALTER TABLE service_center.comments ALTER COLUMN created_at SET NOT NULL;
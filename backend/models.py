@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, Date, ForeignKey, DateTime, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Date, ForeignKey, DateTime, Boolean, Index, Computed, literal_column, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -14,26 +15,67 @@ class User(Base):
     password = Column(String(255), nullable=False)
     user_type = Column(String(50), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, server_default="1")
     is_active = Column(Boolean, default=True)
 
     requests = relationship("Request", back_populates="client", foreign_keys="Request.client_id")
     comments = relationship("Comment", back_populates="master")
 
+    # version увеличивается при каждом UPDATE через ORM и служит основой ETag
+    __mapper_args__ = {"version_id_col": version}
+
+# Конфигурация полнотекстового поиска PostgreSQL
+SEARCH_CONFIG = "russian"
+
+def search_config():
+    return literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+
 class Request(Base):
     __tablename__ = "requests"
-    __table_args__ = {"schema": "service_center"}
+    # Индексы создаются миграциями backend/migrations; здесь они описаны для справки и create_all
+    __table_args__ = (
+        Index("ix_requests_client_status", "client_id", "request_status", "request_id"),
+        Index("ix_requests_master_status", "master_id", "request_status"),
+        Index("ix_requests_tech_type_status", "tech_type", "request_status"),
+        # Статистика по категориям неисправности - GROUP BY по индексу (см. classify.py)
+        Index("ix_requests_problem_category", "problem_category", "client_id"),
+        # Временной ряд статистики: диапазоны дат с колонками фильтров для index-only scan
+        Index("ix_requests_start_date", "start_date",
+              postgresql_include=["completion_date", "tech_type", "master_id", "client_id"]),
+        Index("ix_requests_completion_date", "completion_date",
+              postgresql_include=["start_date", "tech_type", "master_id", "client_id"],
+              postgresql_where=text("completion_date IS NOT NULL")),
+        Index("ix_requests_completed", "client_id", "start_date", "completion_date",
+              postgresql_where=text("completion_date IS NOT NULL")),
+        Index("ix_requests_search_vector", "search_vector", postgresql_using="gin"),
+        # Нечёткий поиск по модели с опечатками (расширение pg_trgm)
+        Index("ix_requests_tech_model_trgm", "tech_model", postgresql_using="gin",
+              postgresql_ops={"tech_model": "gin_trgm_ops"}),
+        {"schema": "service_center"},
+    )
 
     request_id = Column(Integer, primary_key=True, index=True, autoincrement=True) 
     start_date = Column(Date, nullable=False)
     tech_type = Column(String(100), nullable=False)
     tech_model = Column(String(255), nullable=False)
     problem_description = Column(Text, nullable=False)
+    # Вычисляется из problem_description при записи (classify.classify_problem)
+    problem_category = Column(String(50), nullable=True)
     request_status = Column(String(50), nullable=False, default="Новая заявка")
     completion_date = Column(Date, nullable=True)
     repair_parts = Column(Text, nullable=True)
     deadline_date = Column(Date, nullable=True)
     priority = Column(String(20), default="Нормальный")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, server_default="1")
+    # Модель весит больше описания; колонка вычисляется PostgreSQL и в обычные SELECT не попадает
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(tech_model, '')), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(problem_description, '')), 'B')",
+        persisted=True,
+    )))
 
     master_id = Column(Integer, ForeignKey("service_center.users.user_id", ondelete="SET NULL"), nullable=True)
     client_id = Column(Integer, ForeignKey("service_center.users.user_id", ondelete="SET NULL"), nullable=True)
@@ -42,16 +84,45 @@ class Request(Base):
     master = relationship("User", foreign_keys=[master_id])
     comments = relationship("Comment", back_populates="request")
 
+    __mapper_args__ = {"version_id_col": version}
+
 class Comment(Base):
     __tablename__ = "comments"
-    __table_args__ = {"schema": "service_center"}
+    __table_args__ = (
+        # Комментарии заявки читаются одним индексным диапазоном в порядке создания
+        Index("ix_comments_request_id_created_at", "request_id", "created_at", "comment_id"),
+        Index("ix_comments_master_id", "master_id"),
+        # Поиск по тексту комментариев (см. search_config); выражение совпадает с запросом в crud
+        Index("ix_comments_message_fts", text(f"to_tsvector('{SEARCH_CONFIG}'::regconfig, message)"),
+              postgresql_using="gin"),
+        {"schema": "service_center"},
+    )
 
     comment_id = Column(Integer, primary_key=True, index=True)
     message = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # NOT NULL: ключ keyset-пагинации комментариев заявки (миграция 0008)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, server_default="1")
 
     master_id = Column(Integer, ForeignKey("service_center.users.user_id", ondelete="CASCADE"))
     request_id = Column(Integer, ForeignKey("service_center.requests.request_id", ondelete="CASCADE"))
 
     master = relationship("User", back_populates="comments")
-    request = relationship("Request", back_populates="comments")
\ No newline at end of file
+    request = relationship("Request", back_populates="comments")
+
+    __mapper_args__ = {"version_id_col": version}
+
+class RequestStats(Base):
+    """Агрегаты по заявкам для статистики; обновляются в той же транзакции, что и requests"""
+    __tablename__ = "request_stats"
+    __table_args__ = {"schema": "service_center"}
+
+    client_id = Column(Integer, primary_key=True, autoincrement=False)  # 0 - заявки без клиента
+    tech_type = Column(String(100), primary_key=True)
+    request_status = Column(String(50), primary_key=True)
+
+    request_count = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    repair_count = Column(Integer, nullable=False, default=0)
+    repair_days = Column(BigInteger, nullable=False, default=0)
\ No newline at end of file
@@ -0,0 +1,101 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import tuple_, func, select
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_COUNT_MODE_HEADER = "X-Total-Count-Mode"
+
+# Режимы подсчёта: exact - COUNT(*), estimated - оценка планировщика,
+# auto - оценка для запросов без фильтров, если она не меньше порога, иначе COUNT(*)
+COUNT_MODES = ("auto", "exact", "estimated", "none")
+ESTIMATE_THRESHOLD = 10000
+
+def encode_cursor(*values) -> str:
+    """Упаковать значения ключа последней строки в непрозрачный курсор"""
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, columns) -> tuple:
+    """Распаковать курсор, приведя значения к типам колонок ключа"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        result = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            if value is not None and python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif value is not None and python_type is date:
+                value = date.fromisoformat(value)
+            result.append(value)
+        return tuple(result)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор пагинации")
+
+def paginate(query, columns, cursor: Optional[str] = None, limit: int = 100, skip: int = 0,
+             descending: bool = False, key=None):
+    """Keyset-пагинация по ключу columns.
+
+    Вместо OFFSET используется условие (k1, k2, ...) > (значения из курсора),
+    поэтому глубокие страницы читаются по индексу так же быстро, как первая.
+    columns могут быть выражениями; тогда key(row) должен вернуть их значения
+    для строки результата (по умолчанию берутся атрибуты с именами колонок).
+    Возвращает (rows, next_cursor); next_cursor равен None на последней странице.
+    """
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="Размер страницы limit должен быть не меньше 1")
+    if cursor:
+        bound = tuple_(*decode_cursor(cursor, columns))
+        query = query.filter(tuple_(*columns) < bound if descending else tuple_(*columns) > bound)
+    elif skip:
+        # Совместимость со старыми клиентами, передающими skip
+        query = query.offset(skip)
+
+    order = [c.desc() for c in columns] if descending else columns
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        values = key(last) if key else (getattr(last, c.key) for c in columns)
+        next_cursor = encode_cursor(*values)
+    return rows, next_cursor
+
+def estimate_rows(query) -> int:
+    """Оценка числа строк запроса по статистике планировщика (EXPLAIN, без выполнения)"""
+    conn = query.session.connection()
+    compiled = query.statement.compile(dialect=conn.dialect)
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+def count_rows(query, mode: str = "auto"):
+    """Число строк запроса: (count, exact) или (None, None) в режиме none.
+
+    query должен выбирать одну лёгкую колонку (например, первичный ключ)
+    и не содержать ORDER BY и LIMIT.
+    """
+    if mode == "none":
+        return None, None
+    if mode == "exact" or (mode == "auto" and query.whereclause is not None):
+        return _exact_count(query), True
+
+    estimate = estimate_rows(query)
+    if mode == "auto" and estimate < ESTIMATE_THRESHOLD:
+        return _exact_count(query), True
+    return estimate, False
+
+def _exact_count(query) -> int:
+    return query.session.execute(select(func.count()).select_from(query.order_by(None).subquery())).scalar()
+
+def set_total_count(response, total, exact):
+    """Записать X-Total-Count и режим подсчёта в заголовки ответа"""
+    if total is not None:
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+        response.headers[TOTAL_COUNT_MODE_HEADER] = "exact" if exact else "estimated"
@@ -0,0 +1,162 @@
+"""Проверка планов горячих запросов: ни один не должен читать таблицу целиком.
+
+Запросы берутся из настоящих функций crud: они выполняются в транзакции,
+перехваченные SELECT прогоняются через EXPLAIN (FORMAT JSON), после чего
+транзакция откатывается. На маленькой таблице планировщик честно выбирает
+Seq Scan, поэтому проверка идёт с enable_seqscan = off: Seq Scan в плане
+остаётся только там, где подходящего индекса нет вовсе.
+
+    python -m backend.plancheck               # по данным в БД (например, после импорта data/)
+    python -m backend.plancheck --seed 50000  # досеять синтетические строки, потом откатить
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from . import crud
+from .database import SessionLocal
+
+CHECKED_TABLES = {"requests", "comments", "users", "request_stats"}
+
+SEED_SQL = """
+WITH client AS (
+    INSERT INTO service_center.users (fio, phone, login, password, user_type)
+    VALUES ('plancheck', '0', 'plancheck_client', '-', 'Заказчик') RETURNING user_id
+), master AS (
+    INSERT INTO service_center.users (fio, phone, login, password, user_type)
+    VALUES ('plancheck', '0', 'plancheck_master', '-', 'Мастер') RETURNING user_id
+)
+INSERT INTO service_center.requests
+    (start_date, tech_type, tech_model, problem_description, request_status,
+     completion_date, master_id, client_id)
+SELECT current_date - g % 365,
+       (ARRAY['Фен', 'Тостер', 'Холодильник', 'Кондиционер', 'Стиральная машина'])[1 + g % 5],
+       'Model ' || g,
+       (ARRAY['Перестал работать', 'Не морозит одна из камер', 'Не включается', 'Шумит'])[1 + g % 4],
+       (ARRAY['Новая заявка', 'В процессе ремонта', 'Готова к выдаче', 'Завершена'])[1 + g % 4],
+       CASE WHEN g % 4 >= 2 THEN current_date - g % 365 + g % 30 END,
+       CASE WHEN g % 20 = 0 THEN (SELECT user_id FROM master) END,
+       CASE WHEN g % 50 = 0 THEN (SELECT user_id FROM client) END
+FROM generate_series(1, :rows) AS g
+"""
+
+SEED_COMMENTS_SQL = """
+INSERT INTO service_center.comments (message, master_id, request_id)
+SELECT 'Комментарий по заявке ' || r.request_id, r.master_id, r.request_id
+FROM service_center.requests r
+WHERE r.master_id IS NOT NULL
+"""
+
+SAMPLE_SQL = """
+SELECT r.client_id, r.master_id, r.request_id, r.request_status, r.tech_type, u.login
+FROM service_center.requests r
+JOIN service_center.users u ON u.user_id = r.client_id
+WHERE r.master_id IS NOT NULL
+ORDER BY r.request_id DESC
+LIMIT 1
+"""
+
+def hot_calls(sample) -> list:
+    """(название, функция crud, аргументы) для каждого горячего пути"""
+    quarter = dict(date_from=date.today() - timedelta(days=90), date_to=date.today())
+    return [
+        ("вход по логину", crud.get_user_by_login, dict(login=sample.login)),
+        ("заявки заказчика", crud.get_client_requests, dict(client_id=sample.client_id)),
+        ("заявки заказчика по статусу", crud.get_client_requests,
+         dict(client_id=sample.client_id, status=sample.request_status)),
+        ("поиск по мастеру и статусу", crud.search_requests,
+         dict(master_id=sample.master_id, status=sample.request_status)),
+        ("поиск по типу оборудования", crud.search_requests, dict(tech_type=sample.tech_type)),
+        ("поиск по тексту", crud.search_requests, dict(text_query="не морозит")),
+        ("комментарии заявки", crud.get_request_comments, dict(request_id=sample.request_id)),
+        ("статистика заказчика", crud.get_stats_summary, dict(client_id=sample.client_id)),
+        ("статистика по типам", crud.get_stats_by_tech, dict(client_id=sample.client_id)),
+        ("временной ряд", crud.get_stats_timeseries, dict(quarter, bucket="week")),
+        ("временной ряд по мастеру", crud.get_stats_timeseries,
+         dict(quarter, bucket="day", master_id=sample.master_id)),
+    ]
+
+# Проверки внешних ключей при удалении пользователя (ON DELETE SET NULL / CASCADE)
+FK_QUERIES = [
+    ("FK requests.client_id", "SELECT 1 FROM service_center.requests WHERE client_id = %(user_id)s"),
+    ("FK requests.master_id", "SELECT 1 FROM service_center.requests WHERE master_id = %(user_id)s"),
+    ("FK comments.master_id", "SELECT 1 FROM service_center.comments WHERE master_id = %(user_id)s"),
+]
+
+def capture_selects(db: Session, fn, **kwargs) -> list:
+    """Выполнить функцию crud и вернуть отправленные ей SELECT (sql, параметры)"""
+    statements = []
+    conn = db.connection()
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(conn, "before_cursor_execute", listener)
+    try:
+        fn(db, **kwargs)
+    finally:
+        event.remove(conn, "before_cursor_execute", listener)
+    return statements
+
+def seq_scans(plan: dict) -> list:
+    """Таблицы из CHECKED_TABLES, которые план читает последовательно"""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in CHECKED_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+def explain(db: Session, statement: str, parameters) -> dict:
+    cursor = db.connection().connection.cursor()
+    cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+    return cursor.fetchone()[0][0]["Plan"]
+
+def check(db: Session, seed: int = 0) -> list:
+    """Вернуть список (название, таблицы с Seq Scan); пустой список - всё в порядке"""
+    if seed:
+        db.execute(text(SEED_SQL), {"rows": seed})
+        db.execute(text(SEED_COMMENTS_SQL))
+        db.execute(text("ANALYZE service_center.requests"))
+        db.execute(text("ANALYZE service_center.comments"))
+
+    sample = db.execute(text(SAMPLE_SQL)).first()
+    if sample is None:
+        raise RuntimeError("Нет заявок с клиентом и мастером: загрузите данные или запустите с --seed")
+
+    db.execute(text("SET LOCAL enable_seqscan = off"))
+    failures = []
+    for name, fn, kwargs in hot_calls(sample):
+        for statement, parameters in capture_selects(db, fn, **kwargs):
+            tables = seq_scans(explain(db, statement, parameters))
+            print(f"{'SEQ SCAN' if tables else 'ok':8} {name}")
+            if tables:
+                failures.append((name, tables))
+    for name, statement in FK_QUERIES:
+        tables = seq_scans(explain(db, statement, {"user_id": sample.client_id}))
+        print(f"{'SEQ SCAN' if tables else 'ok':8} {name}")
+        if tables:
+            failures.append((name, tables))
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="добавить столько синтетических заявок (откатываются)")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        failures = check(db, seed=args.seed)
+    finally:
+        db.rollback()
+        db.close()
+
+    for name, tables in failures:
+        print(f"Последовательное чтение в «{name}»: {', '.join(sorted(set(tables)))}")
+    print("Планы в порядке" if not failures else f"Запросов с Seq Scan: {len(failures)}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""Профилирование отдельного запроса по требованию.
+
+Запрос с параметром ?profile=1 (или заголовком X-Profile: 1) выполняется как
+обычно, но дополнительно собирается отчёт:
+  - выборочный профиль стеков Python (поток-сэмплер раз в PROFILE_INTERVAL
+    снимает стеки всех занятых потоков: и цикла событий, и пула потоков,
+    где выполняются sync-обработчики);
+  - упорядоченный список SQL-запросов с длительностями (события движка из
+    database.py, см. metrics.RequestStats.statements);
+  - сводка tracemalloc: пик памяти и места с наибольшими выделениями;
+  - подозрения на N+1: один и тот же SQL N_PLUS_ONE_THRESHOLD раз и больше,
+    например ленивые загрузки Request.client, Request.master, Comment.master.
+
+Отчёт сохраняется в PROFILE_DIR, его id возвращается в заголовке
+X-Profile-Id (скачать: GET /debug/profiles/{id}). С ?profile=download отчёт
+возвращается вместо ответа, вложением.
+
+Доступно менеджерам, а при API_PROFILING=1 (локальная отладка) - всем.
+Профили стеков и tracemalloc общие для процесса, поэтому одновременно
+профилируется один запрос, а параллельные запросы попадают в профиль стеков:
+профилируйте на ненагруженном экземпляре.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, QueryParams
+from .auth import principal_for_token
+from .metrics import current_request, route_template
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.getenv("API_PROFILING", "0") == "1"
+PROFILE_ROLES = ("Менеджер",)
+PROFILE_DIR = os.getenv("API_PROFILE_DIR", "profiles")
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+N_PLUS_ONE_HEADER = "X-Profile-N-Plus-One"
+
+PROFILE_INTERVAL = 0.001
+N_PLUS_ONE_THRESHOLD = 3
+TOP_STACKS = 50
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 20
+
+# Стек потока, который сейчас ничего не делает (ждёт задачу, событие или сокет)
+IDLE_FILES = ("threading.py", "queue.py", "selectors.py", os.path.join("concurrent", "futures", "thread.py"))
+
+# Одновременно профилируется один запрос: сэмплер и tracemalloc общие для процесса
+_profile_lock = threading.Lock()
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+class StackSampler(threading.Thread):
+    """Выборочный профиль: раз в interval снимает стеки занятых потоков"""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or frame.f_code.co_filename.endswith(IDLE_FILES):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> dict:
+        self._stop_event.set()
+        self.join()
+        functions = Counter()
+        for stack, count in self.stacks.items():
+            # Функция считается один раз на стек, даже при рекурсии
+            for label in set(stack.split(";")):
+                functions[label.rsplit(":", 1)[0]] += count
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "top_functions": [{"function": f, "samples": n} for f, n in functions.most_common(TOP_FUNCTIONS)],
+            # Свёрнутые стеки (формат flamegraph.pl / speedscope): "внешний;...;внутренний"
+            "stacks": [{"stack": s, "samples": n} for s, n in self.stacks.most_common(TOP_STACKS)],
+        }
+
+def find_n_plus_one(statements: list, threshold: int = N_PLUS_ONE_THRESHOLD) -> list:
+    """Одинаковые SQL, выполненные в запросе threshold раз и больше"""
+    counts, durations = Counter(), Counter()
+    for statement, duration in statements:
+        counts[statement] += 1
+        durations[statement] += duration
+    return [
+        {"sql": statement, "count": count, "total_ms": round(durations[statement] * 1000, 3)}
+        for statement, count in counts.most_common() if count >= threshold
+    ]
+
+def memory_summary(snapshot, peak: int) -> dict:
+    stats = snapshot.statistics("lineno")
+    return {
+        "peak_kb": round(peak / 1024, 1),
+        "allocated_kb": round(sum(s.size for s in stats) / 1024, 1),
+        "top": [{"where": str(s.traceback[0]), "size_kb": round(s.size / 1024, 1), "count": s.count}
+                for s in stats[:TOP_ALLOCATIONS]],
+    }
+
+def load_profile(profile_id: str):
+    """Сохранённый отчёт или None; id проверяется, чтобы не выйти за PROFILE_DIR"""
+    try:
+        uuid.UUID(profile_id)
+    except ValueError:
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.json")
+    return path if os.path.exists(path) else None
+
+async def _profiling_allowed(headers: Headers) -> bool:
+    if PROFILING_ENABLED:
+        return True
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    principal = await run_in_threadpool(principal_for_token, token)
+    return principal is not None and principal.user_type in PROFILE_ROLES
+
+class ProfilingMiddleware:
+    """ASGI-middleware профилирования; подключается внутри MetricsMiddleware,
+    чтобы SQL-запросы попадали в metrics.RequestStats текущего запроса"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = Headers(scope=scope)
+        mode = QueryParams(scope.get("query_string", b"")).get("profile") or headers.get(PROFILE_HEADER)
+        if mode not in ("1", "download") or not await _profiling_allowed(headers):
+            return await self.app(scope, receive, send)
+        if not _profile_lock.acquire(blocking=False):
+            logger.warning("Профилирование пропущено: уже профилируется другой запрос")
+            return await self.app(scope, receive, send)
+        try:
+            await self._profile(scope, receive, send, download=mode == "download")
+        finally:
+            _profile_lock.release()
+
+    async def _profile(self, scope, receive, send, download: bool):
+        stats = current_request.get()
+        statements = []
+        if stats is not None:
+            stats.statements = statements
+        started_tracemalloc = not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        sampler = StackSampler()
+        sampler.start()
+
+        profile_id = str(uuid.uuid4())
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if not download:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (PROFILE_ID_HEADER.lower().encode(), profile_id.encode())]
+            # В режиме download ответ обработчика не отправляется, вместо него уходит отчёт
+            if not download:
+                await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            profile = sampler.stop()
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracemalloc:
+                tracemalloc.stop()
+            if stats is not None:
+                stats.statements = None
+
+        n_plus_one = find_n_plus_one(statements)
+        for item in n_plus_one:
+            logger.warning("Возможный N+1 в %s %s: %d раз %s", scope["method"], route_template(scope),
+                           item["count"], item["sql"])
+        report = {
+            "id": profile_id,
+            "created_at": datetime.now().isoformat(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route_template(scope),
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "sql": {
+                "count": len(statements),
+                "total_ms": round(sum(d for _, d in statements) * 1000, 3),
+                "statements": [{"n": i, "ms": round(d * 1000, 3), "sql": s}
+                               for i, (s, d) in enumerate(statements, 1)],
+            },
+            "n_plus_one": n_plus_one,
+            "profile": profile,
+            "memory": memory_summary(snapshot, peak),
+        }
+        body = json.dumps(report, ensure_ascii=False, indent=1).encode()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "wb") as f:
+            f.write(body)
+
+        if download:
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"content-disposition", f'attachment; filename="profile-{profile_id}.json"'.encode()),
+                (PROFILE_ID_HEADER.lower().encode(), profile_id.encode()),
+                (N_PLUS_ONE_HEADER.lower().encode(), str(len(n_plus_one)).encode()),
+            ]})
+            await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,139 @@
+"""Поддержка таблицы service_center.request_stats.
+
+Каждая запись в requests вносит в строку (client_id, tech_type, request_status)
+свой вклад: одну заявку, признак завершения и длительность ремонта в днях.
+При изменении заявки старый вклад вычитается, новый прибавляется, в той же
+транзакции, что и сама запись.
+
+Пересборка и проверка расхождений:
+    python -m backend.rollup rebuild
+    python -m backend.rollup verify
+"""
+import argparse
+import sys
+from sqlalchemy import select, func, case, and_, literal, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from . import models
+from .database import SessionLocal
+
+KEY = ("client_id", "tech_type", "request_status")
+COUNTERS = ("request_count", "completed_count", "repair_count", "repair_days")
+NO_CLIENT = 0
+
+def snapshot(db_request) -> dict:
+    """Вклад заявки в агрегаты; снимается до и после изменения"""
+    completion_date = db_request.completion_date
+    days = (completion_date - db_request.start_date).days if completion_date and db_request.start_date else None
+    repaired = days is not None and days >= 0
+    return {
+        "client_id": db_request.client_id if db_request.client_id is not None else NO_CLIENT,
+        "tech_type": db_request.tech_type,
+        "request_status": db_request.request_status,
+        "request_count": 1,
+        "completed_count": int(completion_date is not None),
+        "repair_count": int(repaired),
+        "repair_days": days if repaired else 0,
+    }
+
+def apply(db: Session, before: list = (), after: list = ()):
+    """Вычесть вклады before и прибавить вклады after одним upsert-запросом"""
+    deltas = {}
+    for sign, snapshots in ((-1, before), (1, after)):
+        for snap in snapshots:
+            key = tuple(snap[k] for k in KEY)
+            delta = deltas.setdefault(key, dict.fromkeys(COUNTERS, 0))
+            for counter in COUNTERS:
+                delta[counter] += sign * snap[counter]
+
+    # Строки upsert блокируются в порядке VALUES; общий порядок ключей во всех транзакциях
+    # не даёт двум параллельным записям взять одни и те же строки навстречу друг другу
+    rows = [dict(zip(KEY, key), **delta) for key, delta in sorted(deltas.items()) if any(delta.values())]
+    if not rows:
+        return
+
+    table = models.RequestStats.__table__
+    stmt = insert(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(KEY),
+        set_={c: table.c[c] + stmt.excluded[c] for c in COUNTERS},
+    )
+    db.execute(stmt)
+
+def detach_client(db: Session, client_id: int):
+    """Перенести агрегаты клиента в строки без клиента (FK requests.client_id ON DELETE SET NULL)"""
+    table = models.RequestStats.__table__
+    moved = select(
+        literal(NO_CLIENT), table.c.tech_type, table.c.request_status,
+        *(table.c[c] for c in COUNTERS)
+    ).where(table.c.client_id == client_id)
+    stmt = insert(table).from_select(list(KEY + COUNTERS), moved)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(KEY),
+        set_={c: table.c[c] + stmt.excluded[c] for c in COUNTERS},
+    )
+    db.execute(stmt)
+    db.execute(table.delete().where(table.c.client_id == client_id))
+
+def _expected_query():
+    """Агрегаты, посчитанные заново по service_center.requests"""
+    R = models.Request
+    days = R.completion_date - R.start_date
+    repaired = and_(R.completion_date.isnot(None), days >= 0)
+    return select(
+        func.coalesce(R.client_id, NO_CLIENT).label("client_id"),
+        R.tech_type,
+        R.request_status,
+        func.count().label("request_count"),
+        func.count(R.completion_date).label("completed_count"),
+        func.count().filter(repaired).label("repair_count"),
+        func.coalesce(func.sum(case((repaired, days), else_=0)), 0).label("repair_days"),
+    ).group_by(func.coalesce(R.client_id, NO_CLIENT), R.tech_type, R.request_status)
+
+def rebuild(db: Session) -> int:
+    """Пересчитать таблицу агрегатов с нуля; возвращает число строк"""
+    table = models.RequestStats.__table__
+    table.create(db.connection(), checkfirst=True)
+    # Блокируем запись в requests, чтобы пересборка не разошлась с параллельными изменениями
+    db.execute(text("LOCK TABLE service_center.requests IN SHARE MODE"))
+    db.execute(table.delete())
+    result = db.execute(insert(table).from_select(list(KEY + COUNTERS), _expected_query()))
+    db.commit()
+    return result.rowcount
+
+def verify(db: Session) -> list:
+    """Сравнить таблицу агрегатов с пересчётом; возвращает список расхождений"""
+    expected = {tuple(r[:3]): tuple(r[3:]) for r in db.execute(_expected_query())}
+    table = models.RequestStats.__table__
+    stored = {
+        tuple(r[:3]): tuple(r[3:])
+        for r in db.execute(select(*(table.c[c] for c in KEY + COUNTERS)))
+        if any(r[3:])
+    }
+    drift = []
+    for key in sorted(expected.keys() | stored.keys(), key=str):
+        if expected.get(key) != stored.get(key):
+            drift.append((key, stored.get(key), expected.get(key)))
+    return drift
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Агрегаты статистики заявок")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            print(f"Пересобрано строк агрегатов: {rebuild(db)}")
+            return 0
+
+        drift = verify(db)
+        for key, stored, expected in drift:
+            print(f"Расхождение {key}: в таблице {stored}, по заявкам {expected}")
+        print("Расхождений нет" if not drift else f"Найдено расхождений: {len(drift)}")
+        return 1 if drift else 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 from typing import Optional, List
-from datetime import date
-from .. import models, schemas, database
-from ..auth import get_current_user
+from .. import models, crud, schemas, database, events
+from ..auth import get_current_user, principal_for_token, oauth2_scheme, Principal
+from ..pagination import NEXT_CURSOR_HEADER
+from ..conditional import not_modified, list_etag, row_etag
+from ..serialization import schema_columns, list_response
 
 router = APIRouter()
 
@@ -17,67 +20,74 @@ def get_db():
 
 @router.get("/my-requests", response_model=List[schemas.ClientRequestOut])
 def get_my_requests(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
     status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Получить заявки текущего пользователя (клиента)"""
     if current_user.user_type != "Заказчик":
         raise HTTPException(status_code=403, detail="Только для заказчиков")
     
-    query = db.query(models.Request).filter(models.Request.client_id == current_user.user_id)
-    
-    if status:
-        query = query.filter(models.Request.request_status == status)
-    
-    return query.offset(skip).limit(limit).all()
+    rows, next_cursor = crud.get_client_requests(db, current_user.user_id, status=status,
+                                                 skip=skip, limit=limit, cursor=cursor,
+                                                 columns=schema_columns(models.Request, schemas.ClientRequestOut))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return (not_modified(response, if_none_match, list_etag(rows, next_cursor, model=models.Request))
+            or list_response(response, schemas.ClientRequestOut, rows))
 
 @router.post("/my-requests", response_model=schemas.ClientRequestOut)
 def create_my_request(
     request: schemas.ClientRequestCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Создать новую заявку для текущего пользователя"""
     if current_user.user_type != "Заказчик":
         raise HTTPException(status_code=403, detail="Только для заказчиков")
     
-    request_data = request.dict()
-    request_data["client_id"] = current_user.user_id
-    request_data["request_status"] = "Новая заявка"
-    request_data["priority"] = "Нормальный"  # Добавьте это!
-    
-    if not request_data.get("start_date"):
-        request_data["start_date"] = date.today()
-    
     try:
-        db_request = models.Request(**request_data)
-        db.add(db_request)
-        db.commit()
-        db.refresh(db_request)
-        return db_request
+        return crud.create_client_request(db, current_user.user_id, request)
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Ошибка при создании заявки: {str(e)}")
 
+@router.get("/my-requests/events")
+async def my_requests_events(token: str = Depends(oauth2_scheme)):
+    """Изменения статуса, срока и мастера заявок текущего заказчика (Server-Sent Events)"""
+    # Не get_current_user: его сессия закрывается после ответа, а поток SSE не
+    # заканчивается, и соединение из пула висело бы открытой транзакцией.
+    # principal_for_token открывает и закрывает сессию сам.
+    current_user = await run_in_threadpool(principal_for_token, token)
+    if current_user is None:
+        raise HTTPException(status_code=401, detail="Неавторизовано: неверный токен",
+                            headers={"WWW-Authenticate": "Bearer"})
+    if current_user.user_type != "Заказчик":
+        raise HTTPException(status_code=403, detail="Только для заказчиков")
+
+    # X-Accel-Buffering: nginx не должен копить события в буфере
+    return StreamingResponse(events.stream(current_user.user_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.get("/my-requests/{request_id}", response_model=schemas.ClientRequestOut)
 def get_my_request_detail(
     request_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Получить детали конкретной заявки пользователя"""
     if current_user.user_type != "Заказчик":
         raise HTTPException(status_code=403, detail="Только для заказчиков")
     
-    request = db.query(models.Request).filter(
-        models.Request.request_id == request_id,
-        models.Request.client_id == current_user.user_id
-    ).first()
+    request = crud.get_client_request(db, current_user.user_id, request_id)
     
     if not request:
         raise HTTPException(status_code=404, detail="Заявка не найдена или у вас нет доступа")
     
-    return request
\ No newline at end of file
+    return not_modified(response, if_none_match, row_etag(request)) or request
\ No newline at end of file
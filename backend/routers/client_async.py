@@ -0,0 +1,69 @@
+"""Асинхронные версии обработчиков /client (DB_MODE=async)"""
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List
+from .. import models, crud, schemas
+from ..auth import get_current_user_async, Principal
+from ..database import get_async_db
+from ..pagination import NEXT_CURSOR_HEADER
+from ..conditional import not_modified, list_etag, row_etag
+from ..serialization import schema_columns, list_response
+
+router = APIRouter()
+
+@router.get("/my-requests", response_model=List[schemas.ClientRequestOut])
+async def get_my_requests(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    """Получить заявки текущего пользователя (клиента)"""
+    if current_user.user_type != "Заказчик":
+        raise HTTPException(status_code=403, detail="Только для заказчиков")
+    
+    rows, next_cursor = await db.run_sync(crud.get_client_requests, current_user.user_id, status=status,
+                                          skip=skip, limit=limit, cursor=cursor,
+                                          columns=schema_columns(models.Request, schemas.ClientRequestOut))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return (not_modified(response, if_none_match, list_etag(rows, next_cursor, model=models.Request))
+            or list_response(response, schemas.ClientRequestOut, rows))
+
+@router.post("/my-requests", response_model=schemas.ClientRequestOut)
+async def create_my_request(
+    request: schemas.ClientRequestCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    """Создать новую заявку для текущего пользователя"""
+    if current_user.user_type != "Заказчик":
+        raise HTTPException(status_code=403, detail="Только для заказчиков")
+    
+    try:
+        return await db.run_sync(crud.create_client_request, current_user.user_id, request)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка при создании заявки: {str(e)}")
+
+@router.get("/my-requests/{request_id}", response_model=schemas.ClientRequestOut)
+async def get_my_request_detail(
+    request_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    """Получить детали конкретной заявки пользователя"""
+    if current_user.user_type != "Заказчик":
+        raise HTTPException(status_code=403, detail="Только для заказчиков")
+    
+    request = await db.run_sync(crud.get_client_request, current_user.user_id, request_id)
+    
+    if not request:
+        raise HTTPException(status_code=404, detail="Заявка не найдена или у вас нет доступа")
+    
+    return not_modified(response, if_none_match, row_etag(request)) or request
@@ -1,6 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import date
 from sqlalchemy.orm import Session
-from .. import crud, schemas, database
+from .. import models, crud, schemas, database, export
+from ..auth import get_current_user, Principal
+from ..pagination import NEXT_CURSOR_HEADER
+from ..conditional import not_modified, list_etag, row_etag
+from ..serialization import schema_columns, list_response
 
 router = APIRouter()
 
@@ -12,15 +19,42 @@ def get_db():
         db.close()
 
 @router.get("/", response_model=list[schemas.CommentOut])
-def read_comments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_comments(db, skip=skip, limit=limit)
+def read_comments(response: Response, skip: int = 0, limit: int = Query(100, ge=1, le=1000),
+                  cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+                  if_none_match: Optional[str] = Header(None),
+                  db: Session = Depends(get_db)):
+    rows, next_cursor = crud.get_comments(db, skip=skip, limit=limit, cursor=cursor,
+                                          columns=schema_columns(models.Comment, schemas.CommentOut))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return (not_modified(response, if_none_match, list_etag(rows, next_cursor, model=models.Comment))
+            or list_response(response, schemas.CommentOut, rows))
+
+@router.get("/export")
+def export_comments(
+    format: str = Query("csv", pattern="^(csv|ndjson)$", description="Формат: csv или ndjson"),
+    date_from: Optional[date] = Query(None, description="Дата создания, от"),
+    date_to: Optional[date] = Query(None, description="Дата создания, до"),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Выгрузить комментарии потоком"""
+    if current_user.user_type == "Заказчик":
+        raise HTTPException(status_code=403, detail="Выгрузка доступна только сотрудникам")
+    
+    stmt = export.comments_query(date_from=date_from, date_to=date_to)
+    return StreamingResponse(
+        export.stream_rows("comments", stmt, format),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="comments.{format}"'},
+    )
 
 @router.get("/{comment_id}", response_model=schemas.CommentOut)
-def read_comment(comment_id: int, db: Session = Depends(get_db)):
+def read_comment(comment_id: int, response: Response, if_none_match: Optional[str] = Header(None),
+                 db: Session = Depends(get_db)):
     db_comment = crud.get_comment(db, comment_id)
     if db_comment is None:
         raise HTTPException(status_code=404, detail="Comment not found")
-    return db_comment
+    return not_modified(response, if_none_match, row_etag(db_comment)) or db_comment
 
 @router.post("/", response_model=schemas.CommentOut)
 def create_comment(comment: schemas.CommentCreate, db: Session = Depends(get_db)):
@@ -0,0 +1,42 @@
+"""Асинхронные версии обработчиков /comments (DB_MODE=async)"""
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models, crud, schemas
+from ..database import get_async_db
+from ..pagination import NEXT_CURSOR_HEADER
+from ..conditional import not_modified, list_etag, row_etag
+from ..serialization import schema_columns, list_response
+
+router = APIRouter()
+
+@router.get("/", response_model=list[schemas.CommentOut])
+async def read_comments(response: Response, skip: int = 0, limit: int = Query(100, ge=1, le=1000),
+                        cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+                        if_none_match: Optional[str] = Header(None),
+                        db: AsyncSession = Depends(get_async_db)):
+    rows, next_cursor = await db.run_sync(crud.get_comments, skip=skip, limit=limit, cursor=cursor,
+                                          columns=schema_columns(models.Comment, schemas.CommentOut))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return (not_modified(response, if_none_match, list_etag(rows, next_cursor, model=models.Comment))
+            or list_response(response, schemas.CommentOut, rows))
+
+@router.get("/{comment_id}", response_model=schemas.CommentOut)
+async def read_comment(comment_id: int, response: Response, if_none_match: Optional[str] = Header(None),
+                       db: AsyncSession = Depends(get_async_db)):
+    db_comment = await db.run_sync(crud.get_comment, comment_id)
+    if db_comment is None:
+        raise HTTPException(status_code=404, detail="Comment not found")
+    return not_modified(response, if_none_match, row_etag(db_comment)) or db_comment
+
+@router.post("/", response_model=schemas.CommentOut)
+async def create_comment(comment: schemas.CommentCreate, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(crud.create_comment, comment)
+
+@router.delete("/{comment_id}")
+async def delete_comment(comment_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_comment = await db.run_sync(crud.delete_comment, comment_id)
+    if db_comment is None:
+        raise HTTPException(status_code=404, detail="Comment not found")
+    return {"detail": "Comment deleted"}
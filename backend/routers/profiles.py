@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from ..auth import require_roles
+from ..profiling import load_profile
+
+router = APIRouter()
+
+@router.get("/{profile_id}")
+def download_profile(profile_id: str, current=Depends(require_roles('Менеджер'))):
+    """Скачать отчёт профилирования по id из заголовка X-Profile-Id"""
+    path = load_profile(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    return FileResponse(path, media_type="application/json", filename=f"profile-{profile_id}.json")
@@ -1,15 +1,62 @@
+import hashlib
 import io
+from functools import lru_cache
 import qrcode
-from fastapi import APIRouter, Response, Depends
+from qrcode.image.svg import SvgPathImage
+from fastapi import APIRouter, Response, Depends, Header, Query
+from typing import Optional
 from ..auth import require_roles
+from ..conditional import etag_matches
 
 FEEDBACK_URL = "https://docs.google.com/forms/d/e/1FAIpQLSdhZcExx6LSIXxk0ub55mSu-WIh23WYdGG9HY5EZhLDo7P8eA/viewform?usp=sf_link"
 
+# QR-код не меняется, пока не изменится FEEDBACK_URL; ответ зависит от авторизации, поэтому private
+CACHE_CONTROL = "private, max-age=86400"
+RENDER_CACHE_SIZE = 64
+
+ERROR_CORRECTION = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
 router = APIRouter()
 
-@router.get("/feedback", response_class=Response)
-def feedback_qr(current=Depends(require_roles('Оператор','Специалист','Менеджер','Менеджер по качеству','Заказчик'))):
-    img = qrcode.make(FEEDBACK_URL)
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render_qr(size: int = 10, border: int = 4, fmt: str = "png", error_correction: str = "M"):
+    """Отрисовать QR-код FEEDBACK_URL; возвращает (содержимое, ETag)"""
+    qr = qrcode.QRCode(
+        box_size=size,
+        border=border,
+        error_correction=ERROR_CORRECTION[error_correction],
+        image_factory=SvgPathImage if fmt == "svg" else None,
+    )
+    qr.add_data(FEEDBACK_URL)
+    qr.make(fit=True)
     buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    return Response(content=buf.getvalue(), media_type="image/png")
\ No newline at end of file
+    img = qr.make_image()
+    if fmt == "svg":
+        img.save(buf)
+    else:
+        img.save(buf, format="PNG")
+    content = buf.getvalue()
+    return content, '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+
+# Вариант по умолчанию готов ещё до первого запроса. Аргументы передаются так же,
+# как в feedback_qr: lru_cache различает render_qr() и render_qr(10, 4, "png", "M")
+render_qr(10, 4, "png", "M")
+
+@router.get("/feedback", response_class=Response)
+def feedback_qr(size: int = Query(10, ge=1, le=40, description="Размер модуля в пикселях"),
+                border: int = Query(4, ge=0, le=20, description="Ширина рамки в модулях"),
+                format: str = Query("png", pattern="^(png|svg)$", description="Формат: png или svg"),
+                ec: str = Query("M", pattern="^[LMQH]$", description="Уровень коррекции ошибок"),
+                if_none_match: Optional[str] = Header(None),
+                current=Depends(require_roles('Оператор','Специалист','Менеджер','Менеджер по качеству','Заказчик'))):
+    content, etag = render_qr(size, border, format, ec)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type=MEDIA_TYPES[format], headers=headers)
@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
 from typing import Optional
-from datetime import date
-from .. import models, crud, schemas, database
-from ..auth import get_current_user, require_roles
+from datetime import date, timedelta
+from .. import models, crud, schemas, database, export
+from ..auth import get_current_user, Principal
+from ..pagination import NEXT_CURSOR_HEADER, COUNT_MODES, set_total_count
+from ..conditional import not_modified, list_etag, row_etag
+from ..serialization import schema_columns, list_response
 
 router = APIRouter()
 
+# Максимальное число элементов в одном bulk-запросе
+BULK_MAX_ITEMS = 1000
+SEARCH_SORT_PATTERN = f"^-?({'|'.join(crud.SEARCH_SORTS)})$"
+
 def get_db():
     db = database.SessionLocal()
     try:
@@ -16,45 +23,75 @@ def get_db():
         db.close()
 
 @router.get("/", response_model=list[schemas.RequestOut])
-def read_requests(skip: int = 0, limit: int = 100, 
+def read_requests(response: Response, skip: int = 0, limit: int = Query(100, ge=1, le=1000),
+                  cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+                  if_none_match: Optional[str] = Header(None),
                   db: Session = Depends(get_db), 
-                  current_user: models.User = Depends(get_current_user)):
+                  current_user: Principal = Depends(get_current_user)):
     """Получить все заявки (доступно сотрудникам)"""
     if current_user.user_type == "Заказчик":
         raise HTTPException(status_code=403, detail="Заказчикам доступны только свои заявки")
-    return crud.get_requests(db, skip=skip, limit=limit)
+    rows, next_cursor = crud.get_requests(db, skip=skip, limit=limit, cursor=cursor,
+                                          columns=schema_columns(models.Request, schemas.RequestOut))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return (not_modified(response, if_none_match, list_etag(rows, next_cursor, model=models.Request))
+            or list_response(response, schemas.RequestOut, rows))
 
-@router.get("/search", response_model=list[schemas.RequestOut])
+@router.get("/search", response_model=list[schemas.RequestSearchHit])
 def search_requests(
+    response: Response,
     number: Optional[int] = Query(None, description="Номер заявки"),
     status: Optional[str] = Query(None, description="Статус"),
     tech_type: Optional[str] = Query(None, description="Тип оборудования"),
     client_id: Optional[int] = Query(None, description="ID клиента"),
     master_id: Optional[int] = Query(None, description="ID мастера"),
+    q: Optional[str] = Query(None, max_length=200, description="Текст: описание, модель, комментарии"),
+    sort: Optional[str] = Query(None, pattern=SEARCH_SORT_PATTERN,
+                                description="start_date, deadline_date, priority, created_at; '-' - по убыванию"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    count: str = Query("auto", pattern=f"^({'|'.join(COUNT_MODES)})$",
+                       description="Подсчёт X-Total-Count: auto, exact, estimated, none"),
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Поиск заявок"""
     if current_user.user_type == "Заказчик":
         raise HTTPException(status_code=403, detail="Заказчикам доступен только поиск по своим заявкам")
     
-    q = db.query(models.Request)
-    if number is not None:
-        q = q.filter(models.Request.request_id == number)
-    if status is not None:
-        q = q.filter(models.Request.request_status == status)
-    if tech_type is not None:
-        q = q.filter(models.Request.tech_type == tech_type)
-    if client_id is not None:
-        q = q.filter(models.Request.client_id == client_id)
-    if master_id is not None:
-        q = q.filter(models.Request.master_id == master_id)
+    rows, next_cursor, total, exact = crud.search_requests(
+        db, number=number, status=status, tech_type=tech_type, client_id=client_id, master_id=master_id,
+        text_query=q.strip() if q else None, sort=sort, cursor=cursor, skip=skip, limit=limit, count=count)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    set_total_count(response, total, exact)
+    return rows
+
+@router.get("/export")
+def export_requests(
+    format: str = Query("csv", pattern="^(csv|ndjson)$", description="Формат: csv или ndjson"),
+    date_from: Optional[date] = Query(None, description="Дата начала, от"),
+    date_to: Optional[date] = Query(None, description="Дата начала, до"),
+    status: Optional[str] = Query(None, description="Статус"),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Выгрузить заявки потоком"""
+    if current_user.user_type == "Заказчик":
+        raise HTTPException(status_code=403, detail="Выгрузка доступна только сотрудникам")
     
-    return q.all()
+    stmt = export.requests_query(date_from=date_from, date_to=date_to, status=status)
+    return StreamingResponse(
+        export.stream_rows("requests", stmt, format),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="requests.{format}"'},
+    )
 
 @router.get("/{request_id}", response_model=schemas.RequestOut)
-def read_request(request_id: int, db: Session = Depends(get_db),
-                 current_user: models.User = Depends(get_current_user)):
+def read_request(request_id: int, response: Response, if_none_match: Optional[str] = Header(None),
+                 db: Session = Depends(get_db),
+                 current_user: Principal = Depends(get_current_user)):
     """Получить детали заявки"""
     db_request = crud.get_request(db, request_id)
     if db_request is None:
@@ -63,20 +100,59 @@ def read_request(request_id: int, db: Session = Depends(get_db),
     if current_user.user_type == "Заказчик" and db_request.client_id != current_user.user_id:
         raise HTTPException(status_code=403, detail="Нет доступа к этой заявке")
     
-    return db_request
+    return not_modified(response, if_none_match, row_etag(db_request)) or db_request
+
+@router.get("/{request_id}/comments", response_model=list[schemas.CommentOut])
+def read_request_comments(request_id: int, response: Response, limit: int = Query(100, ge=1, le=1000),
+                          cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+                          master_id: Optional[int] = Query(None, description="ID мастера"),
+                          if_none_match: Optional[str] = Header(None),
+                          db: Session = Depends(get_db),
+                          current_user: Principal = Depends(get_current_user)):
+    """Получить комментарии к заявке"""
+    db_request = crud.get_request(db, request_id)
+    if db_request is None:
+        raise HTTPException(status_code=404, detail="Заявка не найдена")
+    
+    if current_user.user_type == "Заказчик" and db_request.client_id != current_user.user_id:
+        raise HTTPException(status_code=403, detail="Нет доступа к этой заявке")
+    
+    rows, next_cursor = crud.get_request_comments(db, request_id, master_id=master_id,
+                                                  limit=limit, cursor=cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return not_modified(response, if_none_match, list_etag(rows, next_cursor)) or rows
 
 @router.post("/", response_model=schemas.RequestOut)
 def create_request(request: schemas.RequestCreate, db: Session = Depends(get_db),
-                   current_user: models.User = Depends(get_current_user)):
+                   current_user: Principal = Depends(get_current_user)):
     """Создать новую заявку"""
     if current_user.user_type == "Заказчик":
         raise HTTPException(status_code=403, detail="Заказчики создают заявки через /client/my-requests")
     return crud.create_request(db, request)
 
+@router.post("/bulk", response_model=list[schemas.BulkItemResult])
+def create_requests_bulk(requests: list[schemas.RequestCreate] = Body(..., max_length=BULK_MAX_ITEMS),
+                         db: Session = Depends(get_db),
+                         current_user: Principal = Depends(get_current_user)):
+    """Создать несколько заявок в одной транзакции"""
+    if current_user.user_type == "Заказчик":
+        raise HTTPException(status_code=403, detail="Заказчики создают заявки через /client/my-requests")
+    return crud.create_requests_bulk(db, requests)
+
+@router.patch("/bulk", response_model=list[schemas.BulkItemResult])
+def update_requests_bulk(items: list[schemas.RequestBulkUpdateItem] = Body(..., max_length=BULK_MAX_ITEMS),
+                         db: Session = Depends(get_db),
+                         current_user: Principal = Depends(get_current_user)):
+    """Изменить несколько заявок (статус, мастер, сроки) в одной транзакции"""
+    if current_user.user_type == "Заказчик":
+        raise HTTPException(status_code=403, detail="Заказчики не могут редактировать заявки")
+    return crud.update_requests_bulk(db, items)
+
 @router.put("/{request_id}", response_model=schemas.RequestOut)
 def update_request(request_id: int, request_update: schemas.RequestUpdate, 
                    db: Session = Depends(get_db),
-                   current_user: models.User = Depends(get_current_user)):
+                   current_user: Principal = Depends(get_current_user)):
     """Обновить заявку"""
     if current_user.user_type == "Заказчик":
         raise HTTPException(status_code=403, detail="Заказчики не могут редактировать заявки")
@@ -88,7 +164,7 @@ def update_request(request_id: int, request_update: schemas.RequestUpdate,
 
 @router.delete("/{request_id}")
 def delete_request(request_id: int, db: Session = Depends(get_db),
-                   current_user: models.User = Depends(get_current_user)):
+                   current_user: Principal = Depends(get_current_user)):
     """Удалить заявку"""
     if current_user.user_type != "Менеджер":
         raise HTTPException(status_code=403, detail="Только менеджеры могут удалять заявки")
@@ -101,7 +177,7 @@ def delete_request(request_id: int, db: Session = Depends(get_db),
 @router.post("/{request_id}/assign", response_model=schemas.RequestOut)
 def assign_master(request_id: int, data: schemas.AssignMasterIn, 
                   db: Session = Depends(get_db),
-                  current_user: models.User = Depends(get_current_user)):
+                  current_user: Principal = Depends(get_current_user)):
     """Назначить мастера на заявку"""
     if current_user.user_type not in ["Менеджер", "Менеджер по качеству"]:
         raise HTTPException(status_code=403, detail="Недостаточно прав")
@@ -115,7 +191,7 @@ def assign_master(request_id: int, data: schemas.AssignMasterIn,
 @router.post("/{request_id}/extend", response_model=schemas.RequestOut)
 def extend_deadline(request_id: int, data: schemas.ExtendDeadlineIn, 
                     db: Session = Depends(get_db),
-                    current_user: models.User = Depends(get_current_user)):
+                    current_user: Principal = Depends(get_current_user)):
     """Продлить срок выполнения заявки"""
     if current_user.user_type not in ["Менеджер", "Менеджер по качеству"]:
         raise HTTPException(status_code=403, detail="Недостаточно прав")
@@ -126,84 +202,76 @@ def extend_deadline(request_id: int, data: schemas.ExtendDeadlineIn,
         raise HTTPException(status_code=404, detail="Заявка не найдена")
     return db_request
 
+def stats_scope(current_user: Principal):
+    """Заказчик видит статистику только по своим заявкам"""
+    return current_user.user_id if current_user.user_type == "Заказчик" else None
+
+@router.get("/stats/summary")
+def stats_summary(db: Session = Depends(get_db), 
+                  current_user: Principal = Depends(get_current_user)):
+    """Получить сводную статистику одним запросом"""
+    return crud.get_stats_summary(db, client_id=stats_scope(current_user))
+
 @router.get("/stats/count")
 def stats_count(db: Session = Depends(get_db), 
-                current_user: models.User = Depends(get_current_user)):
+                current_user: Principal = Depends(get_current_user)):
     """Получить статистику по количеству заявок"""
-    
-    if current_user.user_type == "Заказчик":
-        total = db.query(func.count(models.Request.request_id)).filter(
-            models.Request.client_id == current_user.user_id
-        ).scalar()
-        
-        done = db.query(func.count(models.Request.request_id)).filter(
-            and_(
-                models.Request.client_id == current_user.user_id,
-                models.Request.completion_date.isnot(None)
-            )
-        ).scalar()
-    else:
-        total = db.query(func.count(models.Request.request_id)).scalar()
-        done = db.query(func.count(models.Request.request_id)).filter(
-            models.Request.completion_date.isnot(None)
-        ).scalar()
-    
+    summary = crud.get_stats_counts(db, client_id=stats_scope(current_user))
     return {
-        "total_requests": total or 0, 
-        "completed_requests": done or 0
+        "total_requests": summary["total_requests"], 
+        "completed_requests": summary["completed_requests"]
     }
 
 @router.get("/stats/avg-time")
 def stats_avg_time(db: Session = Depends(get_db), 
-                   current_user: models.User = Depends(get_current_user)):
+                   current_user: Principal = Depends(get_current_user)):
     """Получить среднее время выполнения заявок"""
-    
-    if current_user.user_type == "Заказчик":
-        completed_requests = db.query(models.Request).filter(
-            and_(
-                models.Request.client_id == current_user.user_id,
-                models.Request.completion_date.isnot(None)
-            )
-        ).all()
-    else:
-        completed_requests = db.query(models.Request).filter(
-            models.Request.completion_date.isnot(None)
-        ).all()
-    
-    total_days = 0
-    count = 0
-    
-    for request in completed_requests:
-        if request.start_date and request.completion_date:
-            days = (request.completion_date - request.start_date).days
-            if days >= 0:
-                total_days += days
-                count += 1
-    
-    avg_days_float = total_days / count if count > 0 else 0
-    
+    summary = crud.get_stats_counts(db, client_id=stats_scope(current_user))
     return {
-        "avg_repair_days": round(avg_days_float, 1),
-        "count_completed": count,
-        "total_days": total_days
+        "avg_repair_days": summary["avg_repair_days"],
+        "count_completed": summary["count_completed"],
+        "total_days": summary["total_days"]
     }
 
 @router.get("/stats/by-tech")
 def stats_by_tech(db: Session = Depends(get_db), 
-                  current_user: models.User = Depends(get_current_user)):
+                  current_user: Principal = Depends(get_current_user)):
     """Получить статистику по типам оборудования"""
-    
-    if current_user.user_type == "Заказчик":
-        rows = db.query(
-            models.Request.tech_type, 
-            func.count(models.Request.request_id)
-        ).filter(
-            models.Request.client_id == current_user.user_id
-        ).group_by(models.Request.tech_type).all()
-    else:
-        rows = db.query(
-            models.Request.tech_type, 
-            func.count(models.Request.request_id)
-        ).group_by(models.Request.tech_type).all()
-    
-    return [{"tech_type": r[0], "count": r[1]} for r in rows]
\ No newline at end of file
+    return crud.get_stats_by_tech(db, client_id=stats_scope(current_user))
+
+@router.get("/stats/by-problem-type")
+def stats_by_problem_type(db: Session = Depends(get_db), 
+                          current_user: Principal = Depends(get_current_user)):
+    """Получить статистику по категориям неисправностей"""
+    return crud.get_stats_by_problem_type(db, client_id=stats_scope(current_user))
+
+TIMESERIES_DEFAULT_DAYS = 90
+TIMESERIES_BUCKET_PATTERN = f"^({'|'.join(crud.TIMESERIES_BUCKETS)})$"
+
+def timeseries_range(date_from: Optional[date], date_to: Optional[date], bucket: str):
+    """Период временного ряда: по умолчанию последние TIMESERIES_DEFAULT_DAYS дней"""
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=TIMESERIES_DEFAULT_DAYS)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="Дата from позже даты to")
+    if crud.count_buckets(date_from, date_to, bucket) > crud.TIMESERIES_MAX_POINTS:
+        raise HTTPException(status_code=400,
+                            detail=f"Слишком много точек, не больше {crud.TIMESERIES_MAX_POINTS}: "
+                                   "сократите период или укрупните шаг")
+    return date_from, date_to
+
+@router.get("/stats/timeseries")
+def stats_timeseries(
+    date_from: Optional[date] = Query(None, alias="from", description="Начало периода"),
+    date_to: Optional[date] = Query(None, alias="to", description="Конец периода, по умолчанию сегодня"),
+    bucket: str = Query("week", pattern=TIMESERIES_BUCKET_PATTERN, description="Шаг: day, week или month"),
+    tech_type: Optional[str] = None,
+    master_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Получить поступление, завершение, остаток и перцентили времени ремонта по шагам"""
+    date_from, date_to = timeseries_range(date_from, date_to, bucket)
+    points = crud.get_stats_timeseries(db, date_from, date_to, bucket, tech_type=tech_type,
+                                       master_id=master_id, client_id=stats_scope(current_user))
+    return {"bucket": bucket, "from": date_from, "to": date_to, "points": points}
\ No newline at end of file
@@ -0,0 +1,216 @@
+"""Асинхронные версии обработчиков /requests (DB_MODE=async).
+
+Логика та же, что в requests.py: запросы выполняются функциями crud через
+AsyncSession.run_sync, поэтому ожидание БД не занимает поток пула Starlette.
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import date
+from .. import models, crud, schemas
+from ..auth import get_current_user_async, Principal
+from ..database import get_async_db
+from ..pagination import NEXT_CURSOR_HEADER, COUNT_MODES, set_total_count
+from ..conditional import not_modified, list_etag, row_etag
+from ..serialization import schema_columns, list_response
+from .requests import stats_scope, timeseries_range, SEARCH_SORT_PATTERN, TIMESERIES_BUCKET_PATTERN
+
+router = APIRouter()
+
+@router.get("/", response_model=list[schemas.RequestOut])
+async def read_requests(response: Response, skip: int = 0, limit: int = Query(100, ge=1, le=1000),
+                        cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+                        if_none_match: Optional[str] = Header(None),
+                        db: AsyncSession = Depends(get_async_db),
+                        current_user: Principal = Depends(get_current_user_async)):
+    """Получить все заявки (доступно сотрудникам)"""
+    if current_user.user_type == "Заказчик":
+        raise HTTPException(status_code=403, detail="Заказчикам доступны только свои заявки")
+    rows, next_cursor = await db.run_sync(crud.get_requests, skip=skip, limit=limit, cursor=cursor,
+                                          columns=schema_columns(models.Request, schemas.RequestOut))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return (not_modified(response, if_none_match, list_etag(rows, next_cursor, model=models.Request))
+            or list_response(response, schemas.RequestOut, rows))
+
+@router.get("/search", response_model=list[schemas.RequestSearchHit])
+async def search_requests(
+    response: Response,
+    number: Optional[int] = Query(None, description="Номер заявки"),
+    status: Optional[str] = Query(None, description="Статус"),
+    tech_type: Optional[str] = Query(None, description="Тип оборудования"),
+    client_id: Optional[int] = Query(None, description="ID клиента"),
+    master_id: Optional[int] = Query(None, description="ID мастера"),
+    q: Optional[str] = Query(None, max_length=200, description="Текст: описание, модель, комментарии"),
+    sort: Optional[str] = Query(None, pattern=SEARCH_SORT_PATTERN,
+                                description="start_date, deadline_date, priority, created_at; '-' - по убыванию"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    count: str = Query("auto", pattern=f"^({'|'.join(COUNT_MODES)})$",
+                       description="Подсчёт X-Total-Count: auto, exact, estimated, none"),
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    """Поиск заявок"""
+    if current_user.user_type == "Заказчик":
+        raise HTTPException(status_code=403, detail="Заказчикам доступен только поиск по своим заявкам")
+    rows, next_cursor, total, exact = await db.run_sync(
+        crud.search_requests, number=number, status=status, tech_type=tech_type, client_id=client_id,
+        master_id=master_id, text_query=q.strip() if q else None, sort=sort, cursor=cursor,
+        skip=skip, limit=limit, count=count)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    set_total_count(response, total, exact)
+    return rows
+
+@router.get("/{request_id}", response_model=schemas.RequestOut)
+async def read_request(request_id: int, response: Response, if_none_match: Optional[str] = Header(None),
+                       db: AsyncSession = Depends(get_async_db),
+                       current_user: Principal = Depends(get_current_user_async)):
+    """Получить детали заявки"""
+    db_request = await db.run_sync(crud.get_request, request_id)
+    if db_request is None:
+        raise HTTPException(status_code=404, detail="Заявка не найдена")
+    
+    if current_user.user_type == "Заказчик" and db_request.client_id != current_user.user_id:
+        raise HTTPException(status_code=403, detail="Нет доступа к этой заявке")
+    
+    return not_modified(response, if_none_match, row_etag(db_request)) or db_request
+
+@router.get("/{request_id}/comments", response_model=list[schemas.CommentOut])
+async def read_request_comments(request_id: int, response: Response, limit: int = Query(100, ge=1, le=1000),
+                                cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+                                master_id: Optional[int] = Query(None, description="ID мастера"),
+                                if_none_match: Optional[str] = Header(None),
+                                db: AsyncSession = Depends(get_async_db),
+                                current_user: Principal = Depends(get_current_user_async)):
+    """Получить комментарии к заявке"""
+    db_request = await db.run_sync(crud.get_request, request_id)
+    if db_request is None:
+        raise HTTPException(status_code=404, detail="Заявка не найдена")
+    
+    if current_user.user_type == "Заказчик" and db_request.client_id != current_user.user_id:
+        raise HTTPException(status_code=403, detail="Нет доступа к этой заявке")
+    
+    rows, next_cursor = await db.run_sync(crud.get_request_comments, request_id, master_id=master_id,
+                                          limit=limit, cursor=cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return not_modified(response, if_none_match, list_etag(rows, next_cursor)) or rows
+
+@router.post("/", response_model=schemas.RequestOut)
+async def create_request(request: schemas.RequestCreate, db: AsyncSession = Depends(get_async_db),
+                         current_user: Principal = Depends(get_current_user_async)):
+    """Создать новую заявку"""
+    if current_user.user_type == "Заказчик":
+        raise HTTPException(status_code=403, detail="Заказчики создают заявки через /client/my-requests")
+    return await db.run_sync(crud.create_request, request)
+
+@router.put("/{request_id}", response_model=schemas.RequestOut)
+async def update_request(request_id: int, request_update: schemas.RequestUpdate,
+                         db: AsyncSession = Depends(get_async_db),
+                         current_user: Principal = Depends(get_current_user_async)):
+    """Обновить заявку"""
+    if current_user.user_type == "Заказчик":
+        raise HTTPException(status_code=403, detail="Заказчики не могут редактировать заявки")
+    
+    db_request = await db.run_sync(crud.update_request, request_id, request_update)
+    if db_request is None:
+        raise HTTPException(status_code=404, detail="Заявка не найдена")
+    return db_request
+
+@router.delete("/{request_id}")
+async def delete_request(request_id: int, db: AsyncSession = Depends(get_async_db),
+                         current_user: Principal = Depends(get_current_user_async)):
+    """Удалить заявку"""
+    if current_user.user_type != "Менеджер":
+        raise HTTPException(status_code=403, detail="Только менеджеры могут удалять заявки")
+    
+    deleted = await db.run_sync(crud.delete_request, request_id)
+    if deleted is None:
+        raise HTTPException(status_code=404, detail="Заявка не найдена")
+    return {"detail": "Заявка удалена"}
+
+@router.post("/{request_id}/assign", response_model=schemas.RequestOut)
+async def assign_master(request_id: int, data: schemas.AssignMasterIn,
+                        db: AsyncSession = Depends(get_async_db),
+                        current_user: Principal = Depends(get_current_user_async)):
+    """Назначить мастера на заявку"""
+    if current_user.user_type not in ["Менеджер", "Менеджер по качеству"]:
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    
+    upd = schemas.RequestUpdate(master_id=data.master_id)
+    db_request = await db.run_sync(crud.update_request, request_id, upd)
+    if db_request is None:
+        raise HTTPException(status_code=404, detail="Заявка не найдена")
+    return db_request
+
+@router.post("/{request_id}/extend", response_model=schemas.RequestOut)
+async def extend_deadline(request_id: int, data: schemas.ExtendDeadlineIn,
+                          db: AsyncSession = Depends(get_async_db),
+                          current_user: Principal = Depends(get_current_user_async)):
+    """Продлить срок выполнения заявки"""
+    if current_user.user_type not in ["Менеджер", "Менеджер по качеству"]:
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    
+    upd = schemas.RequestUpdate(deadline_date=data.new_deadline_date)
+    db_request = await db.run_sync(crud.update_request, request_id, upd)
+    if db_request is None:
+        raise HTTPException(status_code=404, detail="Заявка не найдена")
+    return db_request
+
+@router.get("/stats/summary")
+async def stats_summary(db: AsyncSession = Depends(get_async_db),
+                        current_user: Principal = Depends(get_current_user_async)):
+    """Получить сводную статистику одним запросом"""
+    return await db.run_sync(crud.get_stats_summary, client_id=stats_scope(current_user))
+
+@router.get("/stats/count")
+async def stats_count(db: AsyncSession = Depends(get_async_db),
+                      current_user: Principal = Depends(get_current_user_async)):
+    """Получить статистику по количеству заявок"""
+    summary = await db.run_sync(crud.get_stats_counts, client_id=stats_scope(current_user))
+    return {
+        "total_requests": summary["total_requests"],
+        "completed_requests": summary["completed_requests"]
+    }
+
+@router.get("/stats/avg-time")
+async def stats_avg_time(db: AsyncSession = Depends(get_async_db),
+                         current_user: Principal = Depends(get_current_user_async)):
+    """Получить среднее время выполнения заявок"""
+    summary = await db.run_sync(crud.get_stats_counts, client_id=stats_scope(current_user))
+    return {
+        "avg_repair_days": summary["avg_repair_days"],
+        "count_completed": summary["count_completed"],
+        "total_days": summary["total_days"]
+    }
+
+@router.get("/stats/by-tech")
+async def stats_by_tech(db: AsyncSession = Depends(get_async_db),
+                        current_user: Principal = Depends(get_current_user_async)):
+    """Получить статистику по типам оборудования"""
+    return await db.run_sync(crud.get_stats_by_tech, client_id=stats_scope(current_user))
+
+@router.get("/stats/by-problem-type")
+async def stats_by_problem_type(db: AsyncSession = Depends(get_async_db),
+                                current_user: Principal = Depends(get_current_user_async)):
+    """Получить статистику по категориям неисправностей"""
+    return await db.run_sync(crud.get_stats_by_problem_type, client_id=stats_scope(current_user))
+
+@router.get("/stats/timeseries")
+async def stats_timeseries(
+    date_from: Optional[date] = Query(None, alias="from", description="Начало периода"),
+    date_to: Optional[date] = Query(None, alias="to", description="Конец периода, по умолчанию сегодня"),
+    bucket: str = Query("week", pattern=TIMESERIES_BUCKET_PATTERN, description="Шаг: day, week или month"),
+    tech_type: Optional[str] = None,
+    master_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    """Получить поступление, завершение, остаток и перцентили времени ремонта по шагам"""
+    date_from, date_to = timeseries_range(date_from, date_to, bucket)
+    points = await db.run_sync(crud.get_stats_timeseries, date_from, date_to, bucket, tech_type=tech_type,
+                               master_id=master_id, client_id=stats_scope(current_user))
+    return {"bucket": bucket, "from": date_from, "to": date_to, "points": points}
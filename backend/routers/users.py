@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from typing import Optional
 from sqlalchemy.orm import Session
-from .. import crud, schemas, database
-from ..auth import require_roles, get_current_user, hash_password
+from .. import models, crud, schemas, database
+from ..auth import require_roles, get_current_user, hash_password, invalidate_user
+from ..pagination import NEXT_CURSOR_HEADER
+from ..conditional import not_modified, list_etag, row_etag
+from ..serialization import schema_columns, list_response
 
 router = APIRouter()
 
@@ -13,16 +17,25 @@ def get_db():
         db.close()
 
 @router.get("/", response_model=list[schemas.UserOut])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), 
+def read_users(response: Response, skip: int = 0, limit: int = Query(100, ge=1, le=1000),
+               cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+               if_none_match: Optional[str] = Header(None),
+               db: Session = Depends(get_db), 
                current=Depends(require_roles('Менеджер','Менеджер по качеству'))):
-    return crud.get_users(db, skip=skip, limit=limit)
+    rows, next_cursor = crud.get_users(db, skip=skip, limit=limit, cursor=cursor,
+                                       columns=schema_columns(models.User, schemas.UserOut))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return (not_modified(response, if_none_match, list_etag(rows, next_cursor, model=models.User))
+            or list_response(response, schemas.UserOut, rows))
 
 @router.get("/{user_id}", response_model=schemas.UserOut)
-def read_user(user_id: int, db: Session = Depends(get_db)):
+def read_user(user_id: int, response: Response, if_none_match: Optional[str] = Header(None),
+              db: Session = Depends(get_db)):
     db_user = crud.get_user(db, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return db_user
+    return not_modified(response, if_none_match, row_etag(db_user)) or db_user
 
 @router.post("/", response_model=schemas.UserOut)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db), 
@@ -33,10 +46,6 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db),
 def update_user(user_id: int, user_update: schemas.UserUpdate, db: Session = Depends(get_db),
                 current=Depends(require_roles('Менеджер', 'Менеджер по качеству'))):
     """Обновление пользователя"""
-    db_user = crud.get_user(db, user_id)
-    if not db_user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     # Преобразуем данные для обновления
     update_data = user_update.dict(exclude_unset=True)
     
@@ -47,12 +56,11 @@ def update_user(user_id: int, user_update: schemas.UserUpdate, db: Session = Dep
         # Если пароль пустой, не обновляем его
         del update_data["password"]
     
-    # Обновляем поля
-    for key, value in update_data.items():
-        setattr(db_user, key, value)
-    
-    db.commit()
-    db.refresh(db_user)
+    # Обновляем поля одним UPDATE ... RETURNING
+    db_user = crud.update_user(db, user_id, update_data)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(user_id)
     return db_user
 
 @router.delete("/{user_id}")
@@ -61,4 +69,5 @@ def delete_user(user_id: int, db: Session = Depends(get_db),
     deleted = crud.delete_user(db, user_id)
     if deleted is None:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
+    invalidate_user(user_id)
     return {"detail": "Пользователь удалён"}
\ No newline at end of file
@@ -31,10 +31,26 @@ class RequestUpdate(BaseModel):
 class RequestOut(RequestBase):
     request_id: int
     created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
 
     class Config:
         from_attributes = True
 
+class RequestSearchHit(RequestOut):
+    rank: Optional[float] = None
+    headline: Optional[str] = None  # описание с совпадениями в <mark>
+
+class RequestBulkUpdateItem(RequestUpdate):
+    request_id: int
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: str  # created / updated / not_found / error
+    request_id: Optional[int] = None
+    request: Optional[RequestOut] = None
+    detail: Optional[str] = None
+
 # ---------- Users ----------
 class UserBase(BaseModel):
     fio: str
@@ -59,6 +75,8 @@ class UserOut(BaseModel):
     login: str
     user_type: str
     created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
     is_active: Optional[bool] = True
 
     class Config:
@@ -76,6 +94,8 @@ class CommentCreate(CommentBase):
 class CommentOut(CommentBase):
     comment_id: int
     created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -116,6 +136,8 @@ class ClientRequestOut(BaseModel):
     master_id: Optional[int] = None
     client_id: Optional[int] = None  
     created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -0,0 +1,42 @@
+"""Быстрый путь для списков: только нужные колонки, одна проверка, orjson.
+
+Обработчик выбирает колонки из schema_columns(модель, схема) вместо целых
+ORM-объектов (без лишних колонок вроде password и без identity map), затем
+list_response проверяет всю страницу одним вызовом TypeAdapter и отдаёт её
+через ORJSONResponse. Страница проверяется как список TypedDict с полями и
+типами схемы: типы те же, но экземпляры моделей не создаются. response_model
+у маршрута остаётся для документации OpenAPI; готовый Response FastAPI
+повторно не проверяет. Время в UTC записывается с суффиксом Z, как у Pydantic
+в остальных ответах, а не +00:00.
+"""
+from functools import lru_cache
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import inspect
+from typing_extensions import TypedDict
+
+class ListResponse(ORJSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z)
+
+@lru_cache(maxsize=None)
+def schema_columns(model, schema) -> tuple:
+    """Атрибуты модели, которые есть в схеме ответа, в порядке полей схемы"""
+    columns = inspect(model).columns
+    return tuple(getattr(model, name) for name in schema.model_fields if name in columns)
+
+@lru_cache(maxsize=None)
+def _list_adapter(schema, fields: tuple) -> TypeAdapter:
+    row_type = TypedDict(f"{schema.__name__}Row", {name: schema.model_fields[name].annotation for name in fields})
+    return TypeAdapter(list[row_type])
+
+def list_response(response: Response, schema, rows) -> ListResponse:
+    """Проверить страницу строк Row целиком и отдать её orjson-ом с заголовками response"""
+    items = []
+    if rows:
+        fields = tuple(rows[0]._fields)
+        items = _list_adapter(schema, fields).validate_python([dict(zip(fields, row)) for row in rows])
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return ListResponse(items, headers=headers)
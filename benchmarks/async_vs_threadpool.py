@@ -0,0 +1,97 @@
+"""Сравнение масштабирования по конкурентности: sync-обработчики в пуле потоков
+Starlette (psycopg2) против async-обработчиков (asyncpg).
+
+Оба варианта выполняют один и тот же запрос SELECT pg_sleep(:delay), что
+имитирует обращение к БД с заданной задержкой. Пулы соединений делаются
+заведомо больше уровня конкурентности, чтобы ограничением был способ
+обслуживания запросов, а не число соединений.
+
+Запуск (нужна доступная БД из backend/database.py):
+    python -m benchmarks.async_vs_threadpool --levels 10 50 100 200 --requests 400 --delay 0.02
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from backend.database import DATABASE_URL, ASYNC_DATABASE_URL
+
+QUERY = text("SELECT pg_sleep(:delay)")
+
+def build_app(pool_size: int, delay: float):
+    engine = create_engine(DATABASE_URL, pool_size=pool_size, max_overflow=0)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=pool_size, max_overflow=0)
+    Session = sessionmaker(bind=engine)
+    AsyncSession = async_sessionmaker(bind=async_engine)
+    app = FastAPI()
+
+    @app.get("/sync")
+    def sync_handler():
+        with Session() as db:
+            db.execute(QUERY, {"delay": delay})
+        return {"ok": True}
+
+    @app.get("/async")
+    async def async_handler():
+        async with AsyncSession() as db:
+            await db.execute(QUERY, {"delay": delay})
+        return {"ok": True}
+
+    return app, engine, async_engine
+
+async def run_level(client: httpx.AsyncClient, path: str, concurrency: int, total: int):
+    latencies = []
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+async def main(args):
+    app, engine, async_engine = build_app(max(args.levels), args.delay)
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # Прогрев пулов соединений
+            await run_level(client, "/sync", max(args.levels), max(args.levels))
+            await run_level(client, "/async", max(args.levels), max(args.levels))
+
+            print(f"{'конкурентность':>14} | {'режим':>5} | {'req/s':>8} | {'p50, мс':>8} | {'p95, мс':>8}")
+            for level in args.levels:
+                for mode in ("sync", "async"):
+                    result = await run_level(client, f"/{mode}", level, args.requests)
+                    print(f"{level:>14} | {mode:>5} | {result['rps']:>8.1f} | "
+                          f"{result['p50_ms']:>8.1f} | {result['p95_ms']:>8.1f}")
+    finally:
+        engine.dispose()
+        await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--requests", type=int, default=400, help="запросов на каждый уровень")
+    parser.add_argument("--delay", type=float, default=0.02, help="задержка запроса к БД, с")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,71 @@
+"""Пропускная способность сериализации списка заявок: строк в секунду.
+
+current - прежний путь: целые ORM-объекты из crud.get_requests, проверка и
+сериализация через response_model FastAPI (serialize_response) и JSONResponse.
+fast - путь из backend/serialization.py: только колонки RequestOut, проверка
+всей страницы одним TypeAdapter и ORJSONResponse.
+
+В обоих случаях время включает запрос к БД и сборку тела ответа. Если в
+таблице меньше строк, чем самый большой limit, недостающие досеиваются
+в транзакции, которая в конце откатывается.
+
+Запуск (нужна доступная БД из backend/database.py):
+    python -m benchmarks.list_serialization --limits 100 1000 10000 --repeat 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import func, select, text
+
+from backend import crud, models, schemas
+from backend.database import SessionLocal
+from backend.plancheck import SEED_SQL
+from backend.serialization import schema_columns, list_response
+
+def current_path(db, limit: int, field) -> bytes:
+    rows, _ = crud.get_requests(db, limit=limit)
+    content = asyncio.run(serialize_response(field=field, response_content=rows))
+    return JSONResponse(content).body
+
+def fast_path(db, limit: int, field) -> bytes:
+    rows, _ = crud.get_requests(db, limit=limit, columns=schema_columns(models.Request, schemas.RequestOut))
+    return list_response(Response(), schemas.RequestOut, rows).body
+
+def measure(db, path, limit: int, repeat: int, field) -> float:
+    timings = []
+    for _ in range(repeat):
+        # Каждый прогон с пустой identity map, как в новом запросе
+        db.expunge_all()
+        started = time.perf_counter()
+        path(db, limit, field)
+        timings.append(time.perf_counter() - started)
+    return limit / statistics.median(timings)
+
+def main(args):
+    field = create_response_field(name="response", type_=list[schemas.RequestOut], mode="serialization")
+    with SessionLocal() as db:
+        existing = db.scalar(select(func.count()).select_from(models.Request))
+        if existing < max(args.limits):
+            db.execute(text(SEED_SQL), {"rows": max(args.limits) - existing})
+
+        for path in (current_path, fast_path):
+            path(db, min(args.limits), field)  # прогрев
+
+        print(f"{'limit':>6} | {'current, строк/с':>16} | {'fast, строк/с':>14} | {'ускорение':>9}")
+        for limit in args.limits:
+            current = measure(db, current_path, limit, args.repeat, field)
+            fast = measure(db, fast_path, limit, args.repeat, field)
+            print(f"{limit:>6} | {current:>16.0f} | {fast:>14.0f} | {fast / current:>8.1f}x")
+        db.rollback()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limits", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5, help="прогонов на каждый limit")
+    main(parser.parse_args())
@@ -0,0 +1,219 @@
+"""Нагрузочный тест по сценариям фронтенда (frontend/app.py).
+
+Виртуальные пользователи в течение --duration секунд по кругу выполняют
+сценарии, выбранные по весам --mix:
+  staff  - вход сотрудника -> /requests -> /requests/{id} (заявка с
+           комментариями) -> правка заявки -> назначение мастера;
+  client - вход заказчика -> /my-requests -> создание заявки -> /my-requests/{id};
+  stats  - вход сотрудника -> /statistics.
+Каждый сценарий начинается с новой сессии (cookies) и входа. Редиректы после
+POST не выполняются автоматически, а запрашиваются отдельным шагом, как у
+браузера, поэтому каждая страница измеряется отдельно.
+
+Сценарии staff и client пишут в БД (назначают мастера, создают заявки):
+запускайте на тестовой базе. API и фронтенд нужно запустить заранее
+(см. README, раздел 6).
+
+Результат - пропускная способность и p50/p95/p99 по каждому маршруту; он
+сохраняется в JSON (--output) и сравнивается с базовым прогоном (--baseline):
+при ухудшении p95 или пропускной способности больше --tolerance скрипт
+завершается с кодом 1.
+
+    python -m benchmarks.load_frontend --concurrency 20 --duration 60 --output load.json
+    python -m benchmarks.load_frontend --concurrency 20 --duration 60 --baseline load.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime
+
+import httpx
+
+REQUEST_LINK = re.compile(r'href="/requests/(\d+)"')
+MY_REQUEST_LINK = re.compile(r'href="/my-requests/(\d+)"')
+DEFAULT_MIX = "staff=5,client=3,stats=1"
+TECH_TYPES = ("Фен", "Тостер", "Холодильник", "Стиральная машина")
+
+class Recorder:
+    """Задержки и ошибки по меткам маршрутов"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, label: str, seconds: float, ok: bool):
+        self.latencies[label].append(seconds)
+        if not ok:
+            self.errors[label] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        routes = {}
+        for label, values in sorted(self.latencies.items()):
+            routes[label] = dict(requests=len(values), errors=self.errors[label],
+                                 rps=len(values) / elapsed, **percentiles(values))
+        everything = [v for values in self.latencies.values() for v in values]
+        total = dict(requests=len(everything), errors=sum(self.errors.values()),
+                     rps=len(everything) / elapsed, **percentiles(everything))
+        return {"routes": routes, "total": total}
+
+def percentiles(values: list) -> dict:
+    if len(values) < 2:
+        value = values[0] * 1000 if values else 0.0
+        return {"p50_ms": value, "p95_ms": value, "p99_ms": value}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50_ms": cuts[49] * 1000, "p95_ms": cuts[94] * 1000, "p99_ms": cuts[98] * 1000}
+
+class VirtualUser:
+    def __init__(self, args, recorder: Recorder):
+        self.args = args
+        self.recorder = recorder
+        self.client = None
+
+    async def call(self, method: str, path: str, label: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.add(label, time.perf_counter() - started, ok=False)
+            return None
+        # Фронтенд при ошибке API делает redirect с flash, поэтому успех - и 2xx, и 3xx
+        self.recorder.add(label, time.perf_counter() - started, ok=response.status_code < 400)
+        return response
+
+    async def post_and_follow(self, path: str, label: str, data: dict, follow_label: str):
+        response = await self.call("POST", path, label, data=data)
+        if response is not None and response.is_redirect:
+            await self.call("GET", response.headers["location"], follow_label)
+
+    async def login(self, login: str, password: str) -> bool:
+        response = await self.call("POST", "/login", "POST /login", data={"login": login, "password": password})
+        # Успешный вход - redirect на главную; неудачный снова показывает форму
+        return response is not None and response.is_redirect
+
+    async def staff_flow(self):
+        if not await self.login(self.args.staff_login, self.args.staff_password):
+            return
+        listing = await self.call("GET", "/requests", "GET /requests")
+        ids = REQUEST_LINK.findall(listing.text) if listing is not None else []
+        if not ids:
+            return
+        request_id = random.choice(ids)
+        await self.call("GET", f"/requests/{request_id}", "GET /requests/{id}")
+        await self.post_and_follow(f"/requests/{request_id}/edit", "POST /requests/{id}/edit",
+                                   {"master_id": self.args.master_id}, "GET /requests/{id}")
+        await self.post_and_follow(f"/requests/{request_id}/assign", "POST /requests/{id}/assign",
+                                   {"master_id": self.args.master_id}, "GET /requests/{id}")
+
+    async def client_flow(self):
+        if not await self.login(self.args.client_login, self.args.client_password):
+            return
+        await self.call("GET", "/my-requests", "GET /my-requests")
+        await self.call("GET", "/my-requests/new", "GET /my-requests/new")
+        form = {
+            "start_date": date.today().isoformat(),
+            "tech_type": random.choice(TECH_TYPES),
+            "tech_model": "Нагрузочный тест",
+            "problem_description": "Заявка создана нагрузочным тестом",
+        }
+        response = await self.call("POST", "/my-requests/new", "POST /my-requests/new", data=form)
+        if response is None or not response.is_redirect:
+            return
+        listing = await self.call("GET", response.headers["location"], "GET /my-requests")
+        ids = MY_REQUEST_LINK.findall(listing.text) if listing is not None else []
+        if ids:
+            await self.call("GET", f"/my-requests/{random.choice(ids)}", "GET /my-requests/{id}")
+
+    async def stats_flow(self):
+        if await self.login(self.args.staff_login, self.args.staff_password):
+            await self.call("GET", "/statistics", "GET /statistics")
+
+    async def run(self, flows: list, weights: list, deadline: float):
+        while time.monotonic() < deadline:
+            flow = random.choices(flows, weights)[0]
+            async with httpx.AsyncClient(base_url=self.args.frontend, timeout=self.args.timeout,
+                                         follow_redirects=False) as client:
+                self.client = client
+                await getattr(self, f"{flow}_flow")()
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("staff", "client", "stats"):
+            raise SystemExit(f"Неизвестный сценарий: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """Маршруты, где p95 выросла или пропускная способность упала больше чем на tolerance"""
+    regressions = []
+    for label, current in dict(result["routes"], total=result["total"]).items():
+        base = baseline["total"] if label == "total" else baseline["routes"].get(label)
+        if not base:
+            continue
+        if base["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {base['p95_ms']:.1f} -> {current['p95_ms']:.1f} мс")
+        if base["rps"] and current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{label}: {base['rps']:.1f} -> {current['rps']:.1f} запросов/с")
+    return regressions
+
+def print_summary(result: dict):
+    print(f"{'маршрут':>28} | {'запросов':>8} | {'ошибок':>6} | {'req/s':>7} | "
+          f"{'p50, мс':>8} | {'p95, мс':>8} | {'p99, мс':>8}")
+    for label, r in list(result["routes"].items()) + [("всего", result["total"])]:
+        print(f"{label:>28} | {r['requests']:>8} | {r['errors']:>6} | {r['rps']:>7.1f} | "
+              f"{r['p50_ms']:>8.1f} | {r['p95_ms']:>8.1f} | {r['p99_ms']:>8.1f}")
+
+async def main(args):
+    mix = parse_mix(args.mix)
+    recorder = Recorder()
+    users = [VirtualUser(args, recorder) for _ in range(args.concurrency)]
+    started = time.monotonic()
+    deadline = started + args.duration
+    await asyncio.gather(*(u.run(list(mix), list(mix.values()), deadline) for u in users))
+    elapsed = time.monotonic() - started
+
+    result = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "frontend": args.frontend,
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 1),
+        "mix": mix,
+        **recorder.summary(elapsed),
+    }
+    print_summary(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print("\nУхудшение относительно базового прогона:")
+            print("\n".join("  " + r for r in regressions))
+            return 1
+        print("\nБез ухудшений относительно базового прогона")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frontend", default="http://127.0.0.1:5000", help="адрес фронтенда")
+    parser.add_argument("--concurrency", type=int, default=10, help="виртуальных пользователей")
+    parser.add_argument("--duration", type=float, default=60, help="длительность прогона, с")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="веса сценариев staff, client, stats")
+    parser.add_argument("--timeout", type=float, default=30, help="таймаут одного запроса, с")
+    parser.add_argument("--staff-login", default="kasoo")
+    parser.add_argument("--staff-password", default="root")
+    parser.add_argument("--client-login", default="login2")
+    parser.add_argument("--client-password", default="pass2")
+    parser.add_argument("--master-id", type=int, default=2, help="мастер для правки и назначения")
+    parser.add_argument("--output", help="сохранить результат в JSON")
+    parser.add_argument("--baseline", help="JSON базового прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="допустимое ухудшение, доля")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,146 @@
+"""Сравнение записи через ORM (SELECT + изменение объекта + commit + refresh)
+с одним UPDATE/DELETE ... RETURNING из backend/crud.py.
+
+Для каждой операции считаются обращения к БД (выполненные SQL-запросы плюс
+COMMIT) и задержка, включая сериализацию ответа в схему роутера: если объект
+после commit() устарел, именно здесь выполнится лишний SELECT.
+
+Все изменения делаются на временных заявках, комментариях и мастере, которые
+удаляются в конце.
+
+Запуск (нужна доступная БД из backend/database.py):
+    python -m benchmarks.write_round_trips --iterations 500
+"""
+import argparse
+import statistics
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from backend import crud, models, rollup, schemas
+from backend.database import SessionLocal, engine
+
+STATUSES = ("Новая заявка", "В процессе ремонта")
+
+def legacy_update_request(db, request_id: int, request_update: schemas.RequestUpdate):
+    """Прежняя реализация crud.update_request"""
+    db_request = crud.get_request(db, request_id)
+    if not db_request:
+        return None
+    before = rollup.snapshot(db_request)
+    for key, value in request_update.dict(exclude_unset=True).items():
+        setattr(db_request, key, value)
+    rollup.apply(db, before=[before], after=[rollup.snapshot(db_request)])
+    db.commit()
+    db.refresh(db_request)
+    return db_request
+
+def legacy_delete_request(db, request_id: int):
+    """Прежняя реализация crud.delete_request"""
+    db_request = crud.get_request(db, request_id)
+    if not db_request:
+        return None
+    rollup.apply(db, before=[rollup.snapshot(db_request)])
+    db.delete(db_request)
+    db.commit()
+    return db_request
+
+def legacy_delete_comment(db, comment_id: int):
+    """Прежняя реализация crud.delete_comment"""
+    db_comment = crud.get_comment(db, comment_id)
+    if not db_comment:
+        return None
+    db.delete(db_comment)
+    db.commit()
+    return db_comment
+
+class RoundTrips:
+    """Счётчик запросов к БД и COMMIT на движке"""
+
+    def __init__(self, bind):
+        self.count = 0
+        event.listen(bind, "before_cursor_execute", self._statement)
+        event.listen(bind, "commit", self._statement)
+
+    def _statement(self, *args, **kwargs):
+        self.count += 1
+
+def scratch_requests(count: int) -> list:
+    """Создать временные заявки без клиента и мастера"""
+    with SessionLocal() as db:
+        rows = [models.Request(start_date=date.today(), tech_type="benchmark", tech_model="benchmark",
+                               problem_description="benchmark", request_status=STATUSES[0])
+                for _ in range(count)]
+        db.add_all(rows)
+        rollup.apply(db, after=[rollup.snapshot(r) for r in rows])
+        db.commit()
+        return [r.request_id for r in rows]
+
+def scratch_master() -> int:
+    with SessionLocal() as db:
+        master = models.User(fio="benchmark", phone="-", login=f"benchmark-{time.time_ns()}",
+                             password="-", user_type="Мастер")
+        db.add(master)
+        db.commit()
+        return master.user_id
+
+def scratch_comments(request_id: int, master_id: int, count: int) -> list:
+    with SessionLocal() as db:
+        rows = [models.Comment(message="benchmark", request_id=request_id, master_id=master_id)
+                for _ in range(count)]
+        db.add_all(rows)
+        db.commit()
+        return [r.comment_id for r in rows]
+
+def measure(counter: RoundTrips, operation, arguments: list, out_schema):
+    latencies, trips = [], []
+    for args in arguments:
+        with SessionLocal() as db:
+            started_trips = counter.count
+            started = time.perf_counter()
+            result = operation(db, *args)
+            out_schema.model_validate(result)
+            latencies.append(time.perf_counter() - started)
+            trips.append(counter.count - started_trips)
+    latencies.sort()
+    return {
+        "trips": statistics.mean(trips),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+def main(args):
+    counter = RoundTrips(engine)
+    n = args.iterations
+    [request_id] = scratch_requests(1)
+    master_id = scratch_master()
+    status_updates = [(request_id, schemas.RequestUpdate(request_status=STATUSES[i % 2])) for i in range(n)]
+    deadline_updates = [(request_id, schemas.RequestUpdate(deadline_date=date.today() + timedelta(days=i)))
+                        for i in range(n)]
+
+    scenarios = [
+        ("update_request", legacy_update_request, crud.update_request, lambda: status_updates, schemas.RequestOut),
+        ("extend_deadline", legacy_update_request, crud.update_request, lambda: deadline_updates, schemas.RequestOut),
+        ("delete_request", legacy_delete_request, crud.delete_request,
+         lambda: [(i,) for i in scratch_requests(n)], schemas.RequestOut),
+        ("delete_comment", legacy_delete_comment, crud.delete_comment,
+         lambda: [(i,) for i in scratch_comments(request_id, master_id, n)], schemas.CommentOut),
+    ]
+    try:
+        print(f"{'операция':>16} | {'вариант':>9} | {'запросов':>8} | {'p50, мс':>8} | {'p95, мс':>8}")
+        for name, legacy, current, arguments, out_schema in scenarios:
+            for variant, operation in (("orm", legacy), ("returning", current)):
+                result = measure(counter, operation, arguments(), out_schema)
+                print(f"{name:>16} | {variant:>9} | {result['trips']:>8.1f} | "
+                      f"{result['p50_ms']:>8.2f} | {result['p95_ms']:>8.2f}")
+    finally:
+        with SessionLocal() as db:
+            crud.delete_request(db, request_id)
+            crud.delete_user(db, master_id)
+        engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500, help="операций каждого вида на вариант")
+    main(parser.parse_args())
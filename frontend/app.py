@@ -1,19 +1,214 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, g, abort
+from flask import before_render_template, template_rendered
 import requests as http
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
 import io
-from functools import wraps
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps, lru_cache
 import logging
 from datetime import datetime
+from markupsafe import Markup, escape
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, REGISTRY
 
 app = Flask(__name__)
 app.secret_key = "service-center-secret-key-123"
 app.config['BOOTSTRAP_SERVE_LOCAL'] = True
 
 API_URL = "http://127.0.0.1:8000"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_COUNT_MODE_HEADER = "X-Total-Count-Mode"
+SEARCH_PAGE_SIZE = 50
+
+# Пул соединений к API: размер, таймауты (connect, read) в секундах, повторы идемпотентных запросов
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "20"))
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3.05"))
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "30"))
+API_RETRIES = int(os.getenv("API_RETRIES", "2"))
+# Адрес API для браузера: поток изменений заявок (SSE) страница читает из API напрямую,
+# не занимая поток фронтенда; origin фронтенда должен быть в allow_origins CORS у API
+API_PUBLIC_URL = os.getenv("API_PUBLIC_URL", "http://localhost:8000")
+# Число потоков для параллельных запросов к API из одного представления
+API_FANOUT_WORKERS = int(os.getenv("API_FANOUT_WORKERS", "8"))
+# Сколько последних GET-ответов с ETag хранить для условных запросов (If-None-Match)
+API_VALIDATOR_CACHE_SIZE = int(os.getenv("API_VALIDATOR_CACHE_SIZE", "256"))
+# Служебные маршруты (/metrics, /internal/*): адреса, с которых они доступны без входа
+# (сборщик Prometheus на той же машине); остальным - только в сессии менеджера
+INTERNAL_ALLOWED_ADDRS = frozenset(a for a in os.getenv("INTERNAL_ALLOWED_ADDRS", "127.0.0.1,::1").split(",") if a)
+INTERNAL_ROLES = ("Менеджер",)
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# ========== МЕТРИКИ ==========
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+PAGE_REQUESTS = Counter(
+    "frontend_http_requests_total", "HTTP-запросы к фронтенду",
+    ["method", "endpoint", "status"])
+PAGE_LATENCY = Histogram(
+    "frontend_http_request_duration_seconds", "Длительность обработки страницы",
+    ["method", "endpoint"], buckets=LATENCY_BUCKETS)
+TEMPLATE_RENDER = Histogram(
+    "frontend_template_render_seconds", "Время рендеринга шаблона",
+    ["template"], buckets=LATENCY_BUCKETS)
+API_CALLS = Counter(
+    "frontend_api_requests_total", "Запросы фронтенда к API",
+    ["method", "endpoint", "status"])
+API_LATENCY = Histogram(
+    "frontend_api_request_duration_seconds", "Длительность запроса к API",
+    ["method", "endpoint"], buckets=LATENCY_BUCKETS)
+
+def api_endpoint_label(endpoint):
+    """Путь API без идентификаторов: /requests/15/comments -> /requests/{id}/comments"""
+    return re.sub(r"/\d+(?=/|$)", "/{id}", endpoint.split("?", 1)[0])
+
+# ========== HTTP-КЛИЕНТ API ==========
+
+class PoolCounters:
+    """Счётчики переиспользования соединений пула (на процесс)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.new_connections = 0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "pid": os.getpid(),
+                "checkouts": self.checkouts,
+                "hits": self.checkouts - self.new_connections,
+                "misses": self.new_connections,
+            }
+
+pool_counters = PoolCounters()
+
+class ValidatorCache:
+    """LRU последних GET-ответов API с ETag.
+
+    Ключ включает токен, поэтому ответы разных пользователей не смешиваются.
+    При повторном GET отправляется If-None-Match; на 304 возвращается
+    сохранённый ответ, и тело заново не передаётся и не разбирается.
+    """
+
+    def __init__(self, maxsize):
+        self.lock = threading.Lock()
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token, url, params):
+        return token, url, tuple(sorted((params or {}).items()))
+
+    def get(self, key):
+        with self.lock:
+            response = self.items.get(key)
+            if response is not None:
+                self.items.move_to_end(key)
+            return response
+
+    def put(self, key, response):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.items[key] = response
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {"size": len(self.items), "hits": self.hits, "misses": self.misses}
+
+validator_cache = ValidatorCache(API_VALIDATOR_CACHE_SIZE)
+
+class ApiClientCollector:
+    """Счётчики пула соединений и кэша валидаторов для /metrics"""
+
+    def collect(self):
+        pool = pool_counters.snapshot()
+        yield CounterMetricFamily("frontend_api_pool_checkouts", "Выдачи соединений из пула к API",
+                                  value=pool["checkouts"])
+        yield CounterMetricFamily("frontend_api_pool_new_connections", "Новые соединения к API (промахи пула)",
+                                  value=pool["misses"])
+        cache = validator_cache.snapshot()
+        yield GaugeMetricFamily("frontend_api_validator_cache_size", "Ответов в кэше валидаторов",
+                                value=cache["size"])
+        lookups = CounterMetricFamily("frontend_api_validator_cache_lookups", "Условные GET по кэшу валидаторов",
+                                      labels=["result"])
+        lookups.add_metric(["hit"], cache["hits"])
+        lookups.add_metric(["miss"], cache["misses"])
+        yield lookups
+
+REGISTRY.register(ApiClientCollector())
+
+class CountingPoolMixin:
+    def _get_conn(self, timeout=None):
+        with pool_counters.lock:
+            pool_counters.checkouts += 1
+        return super()._get_conn(timeout)
+
+    def _new_conn(self):
+        with pool_counters.lock:
+            pool_counters.new_connections += 1
+        return super()._new_conn()
+
+class CountingHTTPConnectionPool(CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+class CountingHTTPSConnectionPool(CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter с keep-alive пулом, повторами и подсчётом попаданий в пул"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+# Один адаптер (и один пул urllib3) на процесс; urllib3 PoolManager потокобезопасен.
+# Объекты Session хранят cookies и заголовки, поэтому у каждого потока свой Session.
+api_adapter = PooledAdapter(
+    pool_connections=4,
+    pool_maxsize=API_POOL_SIZE,
+    max_retries=Retry(total=API_RETRIES, backoff_factor=0.2, status_forcelist=(502, 503, 504),
+                      allowed_methods=Retry.DEFAULT_ALLOWED_METHODS, raise_on_status=False),
+)
+_thread_state = threading.local()
+api_executor = ThreadPoolExecutor(max_workers=API_FANOUT_WORKERS, thread_name_prefix="api-fanout")
+
+def api_session():
+    """Session текущего потока поверх общего пула соединений"""
+    s = getattr(_thread_state, "session", None)
+    if s is None:
+        s = http.Session()
+        s.mount("http://", api_adapter)
+        s.mount("https://", api_adapter)
+        _thread_state.session = s
+    return s
+
 # ========== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ==========
 
 def login_required(f):
@@ -39,49 +234,166 @@ def role_required(*roles):
         return decorated_function
     return decorator
 
+def internal_only(f):
+    """Служебный маршрут: с адресов INTERNAL_ALLOWED_ADDRS или менеджеру, для остальных его нет"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.remote_addr not in INTERNAL_ALLOWED_ADDRS and session.get("role") not in INTERNAL_ROLES:
+            abort(404)
+        return f(*args, **kwargs)
+    return decorated_function
+
+@app.context_processor
+def api_events_context():
+    """Адрес потока изменений заявок для request_events.html"""
+    return {"api_events_url": f"{API_PUBLIC_URL}/client/my-requests/events"}
+
 def api_headers():
     token = session.get("token")
     return {"Authorization": f"Bearer {token}"} if token else {}
 
-def make_api_request(method, endpoint, **kwargs):
+@app.template_filter("highlight")
+def highlight(headline):
+    """Фрагмент из API с совпадениями в <mark>: экранируем всё, кроме этих тегов"""
+    safe = str(escape(headline or ""))
+    return Markup(safe.replace("&lt;mark&gt;", "<mark>").replace("&lt;/mark&gt;", "</mark>"))
+
+def page_params():
+    """Курсор текущей страницы списка из строки запроса"""
+    cursor = request.args.get("cursor")
+    return {"cursor": cursor} if cursor else {}
+
+def next_cursor(response):
+    """Курсор следующей страницы из ответа API (None на последней странице)"""
+    return response.headers.get(NEXT_CURSOR_HEADER) if response is not None else None
+
+def fetch_request_comments(request_id, first_page=None):
+    """Все комментарии заявки, страница за страницей.
+
+    first_page - уже полученный результат (response, error) первой страницы,
+    например из make_api_requests.
+    """
+    comments, params = [], {}
+    while True:
+        if first_page is not None:
+            (response, error), first_page = first_page, None
+        else:
+            response, error = make_api_request('GET', f'/requests/{request_id}/comments',
+                                               params=params, headers=api_headers())
+        if error is not None or not response:
+            return comments
+        comments.extend(response.json())
+        cursor = next_cursor(response)
+        if not cursor:
+            return comments
+        params = {"cursor": cursor}
+
+def _send_api_request(method, endpoint, token, **kwargs):
+    """Отправить запрос к API; не трогает session и flash, поэтому безопасен в других потоках"""
     try:
         url = f"{API_URL}{endpoint}"
-        headers = kwargs.get('headers', {})
+        headers = dict(kwargs.get('headers') or {})
         
-        if "token" in session:
-            token = session.get("token")
+        if token:
             headers["Authorization"] = f"Bearer {token}"
-            kwargs['headers'] = headers
         
-        if method == 'GET':
-            response = http.get(url, **kwargs)
-        elif method == 'POST':
-            response = http.post(url, **kwargs)
-        elif method == 'PUT':
-            response = http.put(url, **kwargs)
-        elif method == 'DELETE':
-            response = http.delete(url, **kwargs)
-        else:
+        if method not in ('GET', 'POST', 'PUT', 'DELETE'):
             return None, "Неверный метод запроса"
         
-        if response.status_code in [200, 201]:
-            return response, None
-        else:
-            try:
-                error_data = response.json()
-                error_msg = error_data.get("detail", "Неизвестная ошибка")
-            except:
-                error_msg = f"Ошибка {response.status_code}"
-            
-            if response.status_code == 401:
-                session.clear()
-                flash("Сессия истекла. Пожалуйста, войдите снова.", "warning")
-            
-            return response, error_msg
+        # Свой If-None-Match означает, что вызывающий сам обрабатывает 304
+        cache_key = cached = None
+        if method == 'GET' and "If-None-Match" not in headers:
+            cache_key = validator_cache.key(token, url, kwargs.get('params'))
+            cached = validator_cache.get(cache_key)
+            if cached is not None:
+                headers["If-None-Match"] = cached.headers["ETag"]
+        
+        kwargs['headers'] = headers
+        kwargs.setdefault('timeout', (API_CONNECT_TIMEOUT, API_READ_TIMEOUT))
+        label = api_endpoint_label(endpoint)
+        started = time.perf_counter()
+        try:
+            response = api_session().request(method, url, **kwargs)
+        except Exception:
+            API_CALLS.labels(method, label, "error").inc()
+            raise
+        finally:
+            API_LATENCY.labels(method, label).observe(time.perf_counter() - started)
+        API_CALLS.labels(method, label, str(response.status_code)).inc()
+        
+        if cache_key is not None:
+            if response.status_code == 304 and cached is not None:
+                validator_cache.record(hit=True)
+                return cached, None
+            validator_cache.record(hit=False)
+            if response.status_code == 200 and "ETag" in response.headers:
+                validator_cache.put(cache_key, response)
+        return response, None
     except Exception as e:
         logger.error(f"API request error: {e}")
         return None, f"Ошибка подключения к серверу: {str(e)}"
 
+def _handle_api_response(response, error):
+    """Разобрать ответ API в потоке запроса Flask: ошибки и сброс сессии при 401"""
+    if response is None:
+        return None, error
+    
+    if response.status_code in [200, 201]:
+        return response, None
+    else:
+        try:
+            error_data = response.json()
+            error_msg = error_data.get("detail", "Неизвестная ошибка")
+        except:
+            error_msg = f"Ошибка {response.status_code}"
+        
+        # При параллельных запросах 401 может прийти несколько раз, сообщаем один раз
+        if response.status_code == 401 and "token" in session:
+            session.clear()
+            flash("Сессия истекла. Пожалуйста, войдите снова.", "warning")
+        
+        return response, error_msg
+
+def make_api_request(method, endpoint, **kwargs):
+    return _handle_api_response(*_send_api_request(method, endpoint, session.get("token"), **kwargs))
+
+def make_api_requests(*calls):
+    """Выполнить независимые запросы к API параллельно.
+
+    calls - кортежи (method, endpoint) или (method, endpoint, kwargs).
+    Возвращает список (response, error) в том же порядке, с той же обработкой
+    ошибок, что и make_api_request.
+    """
+    token = session.get("token")
+    futures = [
+        api_executor.submit(_send_api_request, call[0], call[1], token, **(call[2] if len(call) > 2 else {}))
+        for call in calls
+    ]
+    return [_handle_api_response(*f.result()) for f in futures]
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def record_page_metrics(response):
+    started = g.pop("started", None)
+    if started is not None:
+        endpoint = request.endpoint or "unmatched"
+        PAGE_REQUESTS.labels(request.method, endpoint, str(response.status_code)).inc()
+        PAGE_LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - started)
+    return response
+
+@before_render_template.connect_via(app)
+def start_render_timer(sender, template, context, **extra):
+    g.setdefault("render_started", []).append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def record_render_time(sender, template, context, **extra):
+    stack = g.get("render_started")
+    if stack:
+        TEMPLATE_RENDER.labels(template.name or "string").observe(time.perf_counter() - stack.pop())
+
 # ========== ОСНОВНЫЕ МАРШРУТЫ ==========
 
 @app.route("/")
@@ -129,7 +441,7 @@ def logout():
 @role_required("Оператор", "Специалист", "Менеджер", "Менеджер по качеству")
 def requests_list():
     """Список всех заявок"""
-    response, error = make_api_request('GET', '/requests/', headers=api_headers())
+    response, error = make_api_request('GET', '/requests/', params=page_params(), headers=api_headers())
     
     if error is None and response:
         requests_data = response.json()
@@ -140,6 +452,7 @@ def requests_list():
     
     return render_template("requests_list.html", 
                          requests=requests_data, 
+                         next_cursor=next_cursor(response),
                          role=session.get("role"),
                          title="Список заявок")
 
@@ -148,18 +461,31 @@ def requests_list():
 @role_required("Оператор", "Специалист", "Менеджер", "Менеджер по качеству")
 def search_requests():
     """Поиск заявок"""
-    params = {k: v for k, v in request.args.items() if v}
-    response, error = make_api_request('GET', '/requests/search', params=params, headers=api_headers())
-    
+    params = {k: v for k, v in request.args.items() if v and k not in ("page", "cursor")}
+    page = request.args.get("page", 1, type=int)
+    api_params = dict(params, page_params(), limit=SEARCH_PAGE_SIZE)
+    if "cursor" not in api_params:
+        # Выдача по релевантности листается через skip, остальные - по курсору
+        api_params["skip"] = (max(page, 1) - 1) * SEARCH_PAGE_SIZE
+    response, error = make_api_request('GET', '/requests/search', params=api_params, headers=api_headers())
+    
+    total, total_estimated = None, False
     if error is None and response:
         requests_data = response.json()
+        total = response.headers.get(TOTAL_COUNT_HEADER)
+        total_estimated = response.headers.get(TOTAL_COUNT_MODE_HEADER) == "estimated"
     else:
         requests_data = []
+    cursor = next_cursor(response)
     
     return render_template("requests_list.html", 
                          requests=requests_data, 
                          role=session.get("role"),
                          search_params=params,
+                         total=total,
+                         total_estimated=total_estimated,
+                         next_search_cursor=cursor,
+                         next_page=page + 1 if not cursor and len(requests_data) == SEARCH_PAGE_SIZE else None,
                          title="Результаты поиска")
 
 @app.route("/requests/new", methods=["GET", "POST"])
@@ -196,18 +522,17 @@ def new_request():
 @role_required("Оператор", "Специалист", "Менеджер", "Менеджер по качеству")
 def request_detail(request_id):
     """Детали заявки"""
-    response, error = make_api_request('GET', f'/requests/{request_id}', headers=api_headers())
+    # Заявка и первая страница комментариев запрашиваются параллельно
+    (response, error), comments_page = make_api_requests(
+        ('GET', f'/requests/{request_id}'),
+        ('GET', f'/requests/{request_id}/comments'),
+    )
     
     if error is None and response:
         request_data = response.json()
         
         # Получаем комментарии к этой заявке
-        comments_response, comments_error = make_api_request('GET', '/comments/', headers=api_headers())
-        if comments_error is None and comments_response:
-            all_comments = comments_response.json()
-            request_comments = [c for c in all_comments if c.get('request_id') == request_id]
-        else:
-            request_comments = []
+        request_comments = fetch_request_comments(request_id, first_page=comments_page)
         
         return render_template("request_detail.html", 
                              request=request_data, 
@@ -253,7 +578,7 @@ def my_requests():
         flash("Эта страница только для заказчиков", "warning")
         return redirect(url_for("index"))
     
-    response, error = make_api_request('GET', '/client/my-requests', headers=api_headers())
+    response, error = make_api_request('GET', '/client/my-requests', params=page_params(), headers=api_headers())
     
     if error is None and response:
         requests_data = response.json()
@@ -262,6 +587,7 @@ def my_requests():
     
     return render_template("client_requests.html", 
                          requests=requests_data, 
+                         next_cursor=next_cursor(response),
                          role=session.get("role"),
                          title="Мои заявки")
 
@@ -303,18 +629,16 @@ def my_request_detail(request_id):
         flash("Эта страница только для заказчиков", "warning")
         return redirect(url_for("index"))
     
-    response, error = make_api_request('GET', f'/client/my-requests/{request_id}', headers=api_headers())
+    (response, error), comments_page = make_api_requests(
+        ('GET', f'/client/my-requests/{request_id}'),
+        ('GET', f'/requests/{request_id}/comments'),
+    )
     
     if error is None and response:
         request_data = response.json()
         
         # Получаем комментарии для этой заявки
-        comments_response, comments_error = make_api_request('GET', '/comments/', headers=api_headers())
-        if comments_error is None and comments_response:
-            all_comments = comments_response.json()
-            request_comments = [c for c in all_comments if c.get('request_id') == request_id]
-        else:
-            request_comments = []
+        request_comments = fetch_request_comments(request_id, first_page=comments_page)
         
         return render_template("request_detail.html", 
                              request=request_data, 
@@ -369,7 +693,7 @@ def extend_deadline(request_id):
 @role_required("Менеджер", "Менеджер по качеству")
 def users_list():
     """Управление пользователями"""
-    response, error = make_api_request('GET', '/users/', headers=api_headers())
+    response, error = make_api_request('GET', '/users/', params=page_params(), headers=api_headers())
     
     if error is None and response:
         users = response.json()
@@ -379,6 +703,7 @@ def users_list():
     
     return render_template("users_list.html", 
                          users=users, 
+                         next_cursor=next_cursor(response),
                          role=session.get("role"),
                          title="Управление пользователями")
 
@@ -477,7 +802,7 @@ def edit_user(user_id):
 @role_required("Оператор", "Специалист", "Менеджер", "Менеджер по качеству")
 def comments_list():
     """Список комментариев"""
-    response, error = make_api_request('GET', '/comments/', headers=api_headers())
+    response, error = make_api_request('GET', '/comments/', params=page_params(), headers=api_headers())
     
     if error is None and response:
         comments = response.json()
@@ -487,6 +812,7 @@ def comments_list():
     
     return render_template("comments_list.html", 
                          comments=comments, 
+                         next_cursor=next_cursor(response),
                          role=session.get("role"),
                          title="Комментарии")
 
@@ -516,53 +842,130 @@ def new_comment():
 
 # ========== QR КОД ОБРАТНОЙ СВЯЗИ ==========
 
+FEEDBACK_URL = "https://docs.google.com/forms/d/e/1FAIpQLSdhZcExx6LSIXxk0ub55mSu-WIh23WYdGG9HY5EZhLDo7P8eA/viewform?usp=sf_link"
+QR_CACHE_CONTROL = "private, max-age=86400"
+QR_PARAMS = ("size", "border", "format", "ec")
+
+@lru_cache(maxsize=64)
+def render_qr_locally(size=10, border=4, fmt="png", ec="M"):
+    """Локальная отрисовка QR-кода на случай недоступности API; возвращает (содержимое, mimetype)"""
+    import qrcode
+    from qrcode.image.svg import SvgPathImage
+    qr = qrcode.QRCode(box_size=size, border=border,
+                       error_correction=getattr(qrcode.constants, f"ERROR_CORRECT_{ec}"),
+                       image_factory=SvgPathImage if fmt == "svg" else None)
+    qr.add_data(FEEDBACK_URL)
+    qr.make(fit=True)
+    buf = io.BytesIO()
+    img = qr.make_image()
+    if fmt == "svg":
+        img.save(buf)
+        return buf.getvalue(), "image/svg+xml"
+    img.save(buf, format="PNG")
+    return buf.getvalue(), "image/png"
+
+def qr_response(content, mimetype, etag=None):
+    resp = Response(content, mimetype=mimetype)
+    if etag:
+        resp.headers["ETag"] = etag
+    else:
+        resp.add_etag()
+    resp.headers["Cache-Control"] = QR_CACHE_CONTROL
+    return resp.make_conditional(request)
+
 @app.route("/qr/feedback")
 @login_required
 def qr_feedback():
     """QR код для обратной связи"""
+    params = {k: request.args[k] for k in QR_PARAMS if request.args.get(k)}
+    headers = api_headers()
+    if request.headers.get("If-None-Match"):
+        headers["If-None-Match"] = request.headers["If-None-Match"]
     try:
-        response = http.get(f"{API_URL}/qr/feedback", headers=api_headers())
+        response = api_session().get(f"{API_URL}/qr/feedback", params=params, headers=headers,
+                                     timeout=(API_CONNECT_TIMEOUT, API_READ_TIMEOUT))
+        if response.status_code == 304:
+            return Response(status=304, headers={"ETag": response.headers.get("ETag", ""),
+                                                 "Cache-Control": QR_CACHE_CONTROL})
         if response.status_code == 200:
-            return send_file(io.BytesIO(response.content), mimetype="image/png")
+            return qr_response(response.content, response.headers.get("Content-Type", "image/png"),
+                               response.headers.get("ETag"))
     except Exception as e:
         logger.error(f"QR generation error: {e}")
     
     # Если не удалось получить QR от API, генерируем локально
     try:
-        import qrcode
-        FEEDBACK_URL = "https://docs.google.com/forms/d/e/1FAIpQLSdhZcExx6LSIXxk0ub55mSu-WIh23WYdGG9HY5EZhLDo7P8eA/viewform?usp=sf_link"
-        img = qrcode.make(FEEDBACK_URL)
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        buf.seek(0)
-        return send_file(buf, mimetype="image/png")
+        content, mimetype = render_qr_locally(
+            size=min(max(request.args.get("size", 10, type=int), 1), 40),
+            border=min(max(request.args.get("border", 4, type=int), 0), 20),
+            fmt="svg" if request.args.get("format") == "svg" else "png",
+            ec=request.args.get("ec") if request.args.get("ec") in ("L", "M", "Q", "H") else "M",
+        )
+        return qr_response(content, mimetype)
     except ImportError:
         flash("Для генерации QR-кода установите библиотеку qrcode", "warning")
         return redirect(url_for("index"))
 
 # ========== СТАТИСТИКА ==========
 
+TIMESERIES_PARAMS = ("from", "to", "bucket", "tech_type", "master_id")
+
 @app.route("/statistics")
 @login_required
 def statistics():
     """Статистика работы"""
-    stats_data = {}
-    
-    # Получаем статистику из API
-    endpoints = ['count', 'avg-time', 'by-tech', 'by-problem-type']
+    stats_data = {'count': None, 'avg-time': None, 'by-tech': None}
+    timeseries_params = {k: request.args[k] for k in TIMESERIES_PARAMS if request.args.get(k)}
+    
+    # Основные показатели приходят одним запросом, параллельно с разбивкой по типам проблем
+    # и временным рядом для графиков
+    (response, error), (problems, problems_error), (series, series_error) = make_api_requests(
+        ('GET', '/requests/stats/summary'),
+        ('GET', '/requests/stats/by-problem-type'),
+        ('GET', '/requests/stats/timeseries', {'params': timeseries_params}),
+    )
+    if error is None and response:
+        summary = response.json()
+        stats_data['count'] = {
+            "total_requests": summary["total_requests"],
+            "completed_requests": summary["completed_requests"],
+        }
+        stats_data['avg-time'] = {
+            "avg_repair_days": summary["avg_repair_days"],
+            "median_repair_days": summary["median_repair_days"],
+            "p90_repair_days": summary["p90_repair_days"],
+            "count_completed": summary["count_completed"],
+            "total_days": summary["total_days"],
+        }
+        stats_data['by-tech'] = summary["by_tech"]
     
-    for endpoint in endpoints:
-        response, error = make_api_request('GET', f'/requests/stats/{endpoint}', headers=api_headers())
-        if error is None and response:
-            stats_data[endpoint] = response.json()
-        else:
-            stats_data[endpoint] = None
+    stats_data['by-problem-type'] = problems.json() if problems_error is None and problems else None
+    stats_data['timeseries'] = series.json() if series_error is None and series else None
+    if series_error and timeseries_params:
+        # 422 от валидации приходит списком ошибок, 400 - текстом
+        detail = series_error if isinstance(series_error, str) else "неверные параметры"
+        flash(f"График не построен: {detail}", "warning")
     
     return render_template("statistics.html",
                          stats=stats_data,
+                         filters=timeseries_params,
                          role=session.get("role"),
                          title="Статистика")
 
+# ========== СЛУЖЕБНЫЕ ==========
+
+@app.route("/internal/api-pool")
+@internal_only
+def api_pool_stats():
+    """Счётчики пула соединений к API для текущего процесса"""
+    return jsonify(dict(pool_counters.snapshot(), validator_cache=validator_cache.snapshot()))
+
+@app.route("/metrics")
+@internal_only
+def prometheus_metrics():
+    """Метрики процесса в формате Prometheus"""
+    return Response(generate_latest(), content_type=CONTENT_TYPE_LATEST)
+
 # ========== ОШИБКИ ==========
 
 @app.errorhandler(404)